@@ -0,0 +1,73 @@
+import argparse
+import time
+
+import numpy as np
+
+import physics
+
+# python -m benchmarks.broadphase [--counts 1000 10000] [--check-limit 4000]
+
+DEFAULT_COUNTS = [1_000, 5_000, 10_000, 50_000, 100_000, 200_000]
+CELL_SIZE = 50
+# world area per collider, keeps the density constant across counts
+AREA_PER_ENTITY = 40 * 40
+
+
+def make_colliders(count: int, rng: np.random.Generator):
+    side = np.sqrt(count * AREA_PER_ENTITY)
+    indices = np.arange(count, dtype=np.int64)
+    px = rng.uniform(0, side, count).astype(np.float32)
+    py = rng.uniform(0, side, count).astype(np.float32)
+    radius = rng.uniform(2, 10, count).astype(np.float32)
+    return indices, px, py, radius
+
+
+def check(indices, px, py, radius):
+    grid = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+    grid.build(indices, px, py, radius)
+    got = physics.pair_keys(*grid.pairs())
+    expected = physics.pair_keys(
+        *physics.brute_force_pairs(indices, px, py, radius, CELL_SIZE, CELL_SIZE)
+    )
+    assert len(np.unique(got)) == len(got), "duplicate pairs"
+    assert np.array_equal(np.sort(got), np.sort(expected)), "pairs differ"
+
+
+def bench(indices, px, py, radius, repeat: int) -> tuple[float, int]:
+    grid = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+    best = float("inf")
+    pairs = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        grid.build(indices, px, py, radius)
+        a, _ = grid.pairs()
+        best = min(best, time.perf_counter() - start)
+        pairs = len(a)
+    return best, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="uniform grid broadphase")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check-limit", type=int, default=4_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'colliders':>10} {'pairs':>10} {'ms':>9} {'ns/collider':>12} check")
+    for count in args.counts:
+        colliders = make_colliders(count, rng)
+        checked = "-"
+        if count <= args.check_limit:
+            check(*colliders)
+            checked = "ok"
+        seconds, pairs = bench(*colliders, args.repeat)
+        print(
+            f"{count:>10} {pairs:>10} {seconds * 1e3:>9.2f}"
+            f" {seconds * 1e9 / count:>12.1f} {checked}"
+        )
+
+
+if __name__ == "__main__":
+    main()
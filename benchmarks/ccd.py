@@ -0,0 +1,107 @@
+import argparse
+import time
+
+import numpy as np
+
+import physics
+
+# python -m benchmarks.ccd [--targets 100000] [--movers 10000]
+#                          [--tick-rates 120 60 30 15]
+
+CELL_SIZE = 50
+AREA_PER_ENTITY = 40 * 40
+MOVER_LAYER = 1
+TARGET_LAYER = 2
+
+
+def make_scene(targets: int, movers: int, speed: float, dt: float, seed: int):
+    # slot layout: targets first, then movers
+    rng = np.random.default_rng(seed)
+    count = targets + movers
+    side = np.sqrt(targets * AREA_PER_ENTITY)
+    px = rng.uniform(0, side, count).astype(np.float32)
+    py = rng.uniform(0, side, count).astype(np.float32)
+    radius = np.full(count, 5, dtype=np.float32)
+    radius[targets:] = 2
+    layer = np.full(count, TARGET_LAYER, dtype=np.uint32)
+    layer[targets:] = MOVER_LAYER
+    mask = np.full(count, MOVER_LAYER, dtype=np.uint32)
+    mask[targets:] = TARGET_LAYER
+
+    # targets drift slowly, movers fly straight at `speed`
+    angle = rng.uniform(0, 2 * np.pi, count)
+    velocity = np.full(count, 10.0)
+    velocity[targets:] = speed
+    prev_px = (px - np.cos(angle) * velocity * dt).astype(np.float32)
+    prev_py = (py - np.sin(angle) * velocity * dt).astype(np.float32)
+    movers = np.arange(targets, count, dtype=np.int64)
+    return movers, px, py, prev_px, prev_py, radius, layer, mask
+
+
+def sweep(grid: physics.GridIndex, scene) -> physics.Contacts:
+    movers, px, py, prev_px, prev_py, radius, layer, mask = scene
+    return physics.first_hits(
+        physics.sweep_circles(
+            grid, movers, px, py, prev_px, prev_py, radius, layer, mask
+        )
+    )
+
+
+def check(scene, got: physics.Contacts):
+    # one cell holding everything makes every pair a candidate
+    movers, px, py, prev_px, prev_py, radius, layer, mask = scene
+    indices = np.arange(len(px), dtype=np.int64)
+    grid = physics.GridIndex(1e9, 1e9)
+    grid.build(indices, px, py, radius)
+    expected = sweep(grid, scene)
+    assert np.array_equal(got.a, expected.a), "hit movers differ"
+    assert np.array_equal(got.b, expected.b), "hit targets differ"
+    assert np.allclose(got.toi, expected.toi), "times of impact differ"
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="swept circle collision")
+    parser.add_argument("--targets", type=int, default=100_000)
+    parser.add_argument("--movers", type=int, default=10_000)
+    parser.add_argument("--speed", type=float, default=600)
+    parser.add_argument(
+        "--tick-rates", type=float, nargs="+", default=[120, 60, 30, 15]
+    )
+    parser.add_argument("--check-limit", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'tick rate':>9} {'step px':>8} {'discrete':>9} {'swept':>7}"
+        f" {'sweep ms':>9} check"
+    )
+    for tick_rate in args.tick_rates:
+        scene = make_scene(
+            args.targets, args.movers, args.speed, 1 / tick_rate, args.seed
+        )
+        _, px, py, _, _, radius, layer, mask = scene
+        indices = np.arange(len(px), dtype=np.int64)
+        grid = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+        grid.build(indices, px, py, radius)
+
+        # movers the end of step overlap test catches
+        contacts = physics.narrow_phase(*grid.pairs(), layer, mask, px, py, radius)
+        touched = np.concatenate((contacts.a, contacts.b))
+        discrete = len(np.unique(touched[touched >= args.targets]))
+
+        start = time.perf_counter()
+        hits = sweep(grid, scene)
+        seconds = time.perf_counter() - start
+
+        checked = "-"
+        if args.targets * args.movers <= args.check_limit:
+            check(scene, hits)
+            checked = "ok"
+        print(
+            f"{tick_rate:>9.0f} {args.speed / tick_rate:>8.1f} {discrete:>9}"
+            f" {len(hits):>7} {seconds * 1e3:>9.2f} {checked}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,91 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+import headless
+import main
+
+# python -m benchmarks.contexts [--counts 10000 100000] [--ticks 30]
+
+# world area per entity, same density as the suite
+AREA_PER_ENTITY = 40 * 40
+DT = 1 / 60
+
+
+def create_world(count: int, seed: int) -> main.World:
+    side = int(math.sqrt(count * AREA_PER_ENTITY))
+    return headless.create_world(
+        count, width=side, height=side, script=headless.zigzag_script(), seed=seed
+    )
+
+
+def timed_step(world: main.World) -> float:
+    start = time.perf_counter()
+    headless.step(world, DT)
+    return time.perf_counter() - start
+
+
+def load_scene(world: main.World, count: int):
+    world.create_enemies(
+        world.rng.integers(0, int(world.width), count),
+        world.rng.integers(0, int(world.height), count),
+    )
+
+
+def one_by_one(world: main.World) -> float:
+    # what unloading costs without contexts, every entity on its own
+    start = time.perf_counter()
+    for index in world.ctx_scene.indices.copy().tolist():
+        world.bhv_enemy.remove(index)
+        world.ctx_scene.remove(index)
+        world.entities.remove(index)
+        world.slots.destroy(main.make_entity_id(index, world.slots.generation[index]))
+    return time.perf_counter() - start
+
+
+def bench(count: int, ticks: int, seed: int) -> dict:
+    world = create_world(count, seed)
+    tick_times = np.array([timed_step(world) for _ in range(ticks)])
+
+    # level transition, the tick that unloads the scene and the one that
+    # loads the next, which has to build the neighbour lists from scratch
+    start = time.perf_counter()
+    world.push_unload_context(main.ContextType.SCENE)
+    unload = time.perf_counter() - start + timed_step(world)
+    assert len(world.bhv_enemy) == 0, "scene still loaded"
+
+    start = time.perf_counter()
+    load_scene(world, count)
+    load = time.perf_counter() - start + timed_step(world)
+
+    return {
+        "tick_ms": np.percentile(tick_times, 50) * 1e3,
+        "unload_ms": unload * 1e3,
+        "load_ms": load * 1e3,
+        "one_by_one_ms": one_by_one(create_world(count, seed)) * 1e3,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="context unload at full load")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>8} {'tick ms':>8} {'unload ms':>9} {'load ms':>8}"
+        f" {'one by one ms':>13}"
+    )
+    for count in args.counts:
+        result = bench(count, args.ticks, args.seed)
+        print(
+            f"{count:>8} {result['tick_ms']:>8.2f} {result['unload_ms']:>9.2f}"
+            f" {result['load_ms']:>8.2f} {result['one_by_one_ms']:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
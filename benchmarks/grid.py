@@ -0,0 +1,103 @@
+import argparse
+import time
+
+import numpy as np
+
+import physics
+
+# python -m benchmarks.grid [--counts 10000 100000 1000000]
+#                           [--mixes static slow mixed fast]
+
+CELL_SIZE = 50
+RADIUS = 5
+# world area per entity, same density as the suite
+AREA_PER_ENTITY = 40 * 40
+# share of entities per speed, in pixels per second
+MIXES = {
+    "static": {0: 1.0},
+    "slow": {10: 1.0},
+    "mixed": {0: 0.5, 10: 0.4, 200: 0.1},
+    "fast": {200: 1.0},
+}
+
+
+def check(full: physics.GridIndex, incremental: physics.IncrementalGrid):
+    assert np.array_equal(
+        np.sort(physics.pair_keys(*full.pairs())),
+        np.sort(physics.pair_keys(*incremental.pairs())),
+    ), "pairs differ"
+
+
+def bench(count: int, mix: dict, frames: int, dt: float, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(count * AREA_PER_ENTITY)
+    indices = np.arange(count, dtype=np.int64)
+    px = rng.uniform(0, side, count).astype(np.float32)
+    py = rng.uniform(0, side, count).astype(np.float32)
+    radius = np.full(count, RADIUS, dtype=np.float32)
+    speed = rng.choice(list(mix), count, p=list(mix.values()))
+    angle = rng.uniform(0, 2 * np.pi, count)
+    vx = (np.cos(angle) * speed).astype(np.float32)
+    vy = (np.sin(angle) * speed).astype(np.float32)
+
+    full = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+    incremental = physics.IncrementalGrid(CELL_SIZE, CELL_SIZE)
+    incremental.build(indices, px, py, radius)
+    full_time = 0.0
+    incremental_time = 0.0
+    moved = 0
+    for frame in range(frames):
+        # wrap around like movement does
+        px = (px + vx * dt) % side
+        py = (py + vy * dt) % side
+
+        start = time.perf_counter()
+        full.build(indices, px, py, radius)
+        full.pairs()
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        incremental.build(indices, px, py, radius)
+        incremental.pairs()
+        incremental_time += time.perf_counter() - start
+        moved += incremental.moved
+
+        # checking every frame would dominate the run
+        if frame % 10 == 0:
+            check(full, incremental)
+
+    return {
+        "moved": moved / frames,
+        "full_ms": full_time / frames * 1e3,
+        "incremental_ms": incremental_time / frames * 1e3,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="incremental grid against rebuild")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--mixes", nargs="+", choices=list(MIXES), default=list(MIXES))
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--tick-rate", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>8} {'mix':>6} {'moved/frame':>11} {'rebuild ms':>10}"
+        f" {'incremental ms':>14}"
+    )
+    for count in args.counts:
+        for mix in args.mixes:
+            result = bench(
+                count, MIXES[mix], args.frames, 1 / args.tick_rate, args.seed
+            )
+            print(
+                f"{count:>8} {mix:>6} {result['moved']:>11.0f}"
+                f" {result['full_ms']:>10.2f} {result['incremental_ms']:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    cli()
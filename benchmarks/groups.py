@@ -0,0 +1,81 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+import headless
+import main
+
+# python -m benchmarks.groups [--counts 100000 1000000] [--churns 0.001 0.01]
+
+# world area per entity, same density as the suite
+AREA_PER_ENTITY = 40 * 40
+DT = 1 / 60
+
+
+def movement_ms(world: main.World, repeats: int = 5) -> float:
+    # a system walking the group, it gathers and scatters a dozen columns
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        main.update_movement(
+            world.slots, world.entities.indices, DT, world.width, world.height
+        )
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def bench(count: int, share: float, frames: int, seed: int) -> dict:
+    side = int(math.sqrt(count * AREA_PER_ENTITY))
+    world = headless.create_world(count, width=side, height=side, seed=seed)
+    rng = np.random.default_rng(seed)
+    group = world.entities
+
+    # members leave and come back, swap removes and appends like spawning
+    # into freed slots does
+    for _ in range(frames):
+        churned = rng.choice(group.indices, round(share * count), replace=False)
+        group.remove_many(churned)
+        group.add_many(churned)
+
+    disorder = group.disorder() / len(group)
+    unsorted = movement_ms(world)
+    start = time.perf_counter()
+    group.sort()
+    sort = (time.perf_counter() - start) * 1e3
+    return {
+        "disorder": disorder,
+        "unsorted_ms": unsorted,
+        "sort_ms": sort,
+        "sorted_ms": movement_ms(world),
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="group sort against disorder")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100_000, 1_000_000])
+    # share of the members that leaves and comes back every frame
+    parser.add_argument(
+        "--churns", type=float, nargs="+", default=[0.0001, 0.001, 0.01]
+    )
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>8} {'churn':>6} {'disorder':>8} {'unsorted ms':>11}"
+        f" {'sort ms':>7} {'sorted ms':>9}"
+    )
+    for count in args.counts:
+        for share in args.churns:
+            result = bench(count, share, args.frames, args.seed)
+            print(
+                f"{count:>8} {share:>6.4f} {result['disorder']:>8.3f}"
+                f" {result['unsorted_ms']:>11.2f} {result['sort_ms']:>7.2f}"
+                f" {result['sorted_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    cli()
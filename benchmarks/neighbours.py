@@ -0,0 +1,165 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+import physics
+
+# python -m benchmarks.neighbours [--counts 10000 100000] [--speeds 10 50]
+#                                 [--skins 10 20 40] [--limits 0 8]
+#                                 [--churns 0 0.001] [--wave 30]
+#                                 [--spacings 60 300]
+
+CELL_SIZE = 50
+PERCEPTION = 100
+
+
+def fresh(indices, px, py, radius, limit: int):
+    # what a radius query per frame costs, the grid included, px and py by
+    # slot and radius per entity of indices
+    qx = px[indices]
+    qy = py[indices]
+    grid = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+    grid.build(indices, qx, qy, np.zeros_like(radius))
+    query, index, dist2 = physics.query_radius(grid, qx, qy, radius, px, py)
+    keep = index != indices[query]
+    query, index, dist2 = query[keep], index[keep], dist2[keep]
+    if limit == 0:
+        return query, index
+
+    nearest, _ = physics.k_nearest(len(indices), query, index, dist2, limit)
+    query, rank = np.nonzero(nearest >= 0)
+    return query, nearest[query, rank]
+
+
+def check(indices, neighbour, counts, expected):
+    assert counts.sum() == len(neighbour), "counts differ"
+    # as slot pairs, the fresh query gives positions in indices -> slots
+    query = np.repeat(indices, counts)
+    expected_query, expected_index = expected
+    assert np.array_equal(
+        np.sort(physics.pair_keys(query, indices[neighbour])),
+        np.sort(physics.pair_keys(indices[expected_query], expected_index)),
+    ), "neighbours differ"
+
+
+def bench(
+    count: int,
+    speed: float,
+    skin: float,
+    limit: int,
+    churn: float,
+    spacing: float,
+    wave: int,
+    frames: int,
+    dt: float,
+    seed: int,
+) -> dict:
+    rng = np.random.default_rng(seed)
+    # every entity gets a spacing sided square of the world, keeps the
+    # neighbour count constant across counts
+    side = np.sqrt(count) * spacing
+    alive = np.ones(count, dtype=np.bool_)
+    px = rng.uniform(0, side, count).astype(np.float32)
+    py = rng.uniform(0, side, count).astype(np.float32)
+    radius = np.full(count, PERCEPTION, dtype=np.float32)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    vx = (np.cos(angle) * speed).astype(np.float32)
+    vy = (np.sin(angle) * speed).astype(np.float32)
+    # the last slot stays outside the world without neighbours and never dies,
+    # every death happens while the last entity is isolated
+    px[-1] = py[-1] = -2 * PERCEPTION
+    vx[-1] = vy[-1] = 0
+
+    neighbours = physics.NeighbourList(skin, limit or None)
+    fresh_time = 0.0
+    cached_time = 0.0
+    for frame in range(frames):
+        px += vx * dt
+        py += vy * dt
+        # churn share of the entities dies every frame, the dead come back
+        # somewhere else in one wave every so often like a spawner would
+        dying = rng.choice(
+            np.flatnonzero(alive[:-1]), round(churn * count), replace=False
+        )
+        alive[dying] = False
+        if frame % wave == wave - 1:
+            spawned = ~alive
+            px[spawned] = rng.uniform(0, side, spawned.sum())
+            py[spawned] = rng.uniform(0, side, spawned.sum())
+            alive[:] = True
+        indices = np.flatnonzero(alive)
+
+        start = time.perf_counter()
+        expected = fresh(indices, px, py, radius[indices], limit)
+        fresh_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        neighbour, _, _, counts = neighbours.query_radius(
+            indices, px[indices], py[indices], radius[indices]
+        )
+        cached_time += time.perf_counter() - start
+
+        # checking every frame would dominate the run
+        if frame % 10 == 0:
+            check(indices, neighbour, counts, expected)
+
+    return {
+        "pairs": len(neighbour),
+        "isolated": np.count_nonzero(counts == 0),
+        "listed": len(neighbours),
+        "rebuilds": neighbours.rebuilds,
+        "fresh_ms": fresh_time / frames * 1e3,
+        "cached_ms": cached_time / frames * 1e3,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="verlet neighbour lists")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--speeds", type=float, nargs="+", default=[10, 50])
+    parser.add_argument("--skins", type=float, nargs="+", default=[10, 20, 40])
+    # 0 keeps every neighbour within perception
+    parser.add_argument("--limits", type=int, nargs="+", default=[0, 8])
+    # share of the entities that dies every frame, respawned every wave frames
+    parser.add_argument("--churns", type=float, nargs="+", default=[0, 0.001])
+    parser.add_argument("--wave", type=int, default=30)
+    # side of the world area per entity, at 300 most entities have no
+    # neighbour within perception
+    parser.add_argument("--spacings", type=float, nargs="+", default=[60, 300])
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--tick-rate", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>8} {'spacing':>7} {'speed':>5} {'skin':>4} {'limit':>5}"
+        f" {'churn':>6} {'pairs':>9} {'isolated':>8}"
+        f" {'listed':>9} {'rebuilds':>8} {'fresh ms':>8} {'cached ms':>9}"
+    )
+    for count, spacing, speed, skin, limit, churn in itertools.product(
+        args.counts, args.spacings, args.speeds, args.skins, args.limits, args.churns
+    ):
+        result = bench(
+            count,
+            speed,
+            skin,
+            limit,
+            churn,
+            spacing,
+            args.wave,
+            args.frames,
+            1 / args.tick_rate,
+            args.seed,
+        )
+        print(
+            f"{count:>8} {spacing:>7.0f} {speed:>5.0f} {skin:>4.0f} {limit:>5}"
+            f" {churn:>6.3f} {result['pairs']:>9} {result['isolated']:>8}"
+            f" {result['listed']:>9} {result['rebuilds']:>8}"
+            f" {result['fresh_ms']:>8.2f} {result['cached_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+import physics
+
+# python -m benchmarks.response [--counts 10000 50000] [--iterations 1 4 8]
+
+CELL_SIZE = 50
+RADIUS = 5
+# dense enough that most bodies start out overlapping a neighbour
+AREA_PER_ENTITY = 12 * 12
+
+
+def overlap(indices, px, py, radius) -> tuple[physics.Contacts, float]:
+    # contacts and summed penetration depth
+    grid = physics.GridIndex(CELL_SIZE, CELL_SIZE)
+    grid.build(indices, px[indices], py[indices], radius[indices])
+    a, b = grid.pairs()
+    layer = np.ones(len(px), dtype=np.uint32)
+    contacts = physics.narrow_phase(a, b, layer, layer, px, py, radius)
+    return contacts, float(contacts.depth.sum())
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="vectorized contact resolution")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--iterations", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--restitution", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'bodies':>8} {'iters':>5} {'contacts':>9} {'depth':>10}"
+        f" {'after':>10} {'resolve ms':>11}"
+    )
+    for count in args.counts:
+        rng = np.random.default_rng(args.seed)
+        side = np.sqrt(count * AREA_PER_ENTITY)
+        start_px = rng.uniform(0, side, count).astype(np.float32)
+        start_py = rng.uniform(0, side, count).astype(np.float32)
+        indices = np.arange(count, dtype=np.int64)
+        radius = np.full(count, RADIUS, dtype=np.float32)
+        contacts, depth = overlap(indices, start_px, start_py, radius)
+        inv_mass = np.ones(len(contacts), dtype=np.float32)
+
+        for iterations in args.iterations:
+            px = start_px.copy()
+            py = start_py.copy()
+            vx = np.zeros(count, dtype=np.float32)
+            vy = np.zeros(count, dtype=np.float32)
+
+            start = time.perf_counter()
+            physics.resolve_contacts(
+                contacts.a,
+                contacts.b,
+                inv_mass,
+                inv_mass,
+                px,
+                py,
+                vx,
+                vy,
+                radius,
+                iterations,
+                args.restitution,
+            )
+            seconds = time.perf_counter() - start
+
+            _, after = overlap(indices, px, py, radius)
+            print(
+                f"{count:>8} {iterations:>5} {len(contacts):>9} {depth:>10.1f}"
+                f" {after:>10.1f} {seconds * 1e3:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,72 @@
+import argparse
+import math
+import os
+import time
+
+import headless
+import main
+import sharding
+
+# python -m benchmarks.sharding [--entities 200000] [--workers 1 2 4]
+
+AREA_PER_ENTITY = 40 * 40
+DT = 1 / 60
+
+
+def create_world(entities: int, seed: int, allocate=None) -> main.World:
+    side = int(math.sqrt(entities * AREA_PER_ENTITY))
+    return headless.create_world(
+        entities, width=side, height=side, seed=seed, allocate=allocate
+    )
+
+
+def ticks_per_sec(step, world: main.World, ticks: int, warmup: int) -> float:
+    for _ in range(warmup):
+        world.platform.advance(DT)
+        step(world)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.platform.advance(DT)
+        step(world)
+    return ticks / (time.perf_counter() - start)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="sharded simulation scaling")
+    parser.add_argument("--entities", type=int, default=200_000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)],
+    )
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    world = create_world(args.entities, args.seed)
+    baseline = ticks_per_sec(lambda w: main.step(w, DT), world, args.ticks, args.warmup)
+    print(f"{'workers':>8} {'ticks/s':>10} {'speedup':>8}")
+    print(f"{'single':>8} {baseline:>10.1f} {1:>7.2f}x")
+
+    for workers in args.workers:
+        arrays = sharding.SharedArrays()
+        world = create_world(args.entities, args.seed, arrays)
+        simulation = sharding.ShardedSimulation(world, arrays, workers)
+        try:
+            rate = ticks_per_sec(
+                lambda w: sharding.step(w, simulation, DT),
+                world,
+                args.ticks,
+                args.warmup,
+            )
+        finally:
+            simulation.close()
+            del world
+            arrays.close()
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    cli()
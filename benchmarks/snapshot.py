@@ -0,0 +1,94 @@
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import headless
+import snapshot
+
+# python -m benchmarks.snapshot [--counts 10000 100000 1000000]
+
+AREA_PER_ENTITY = 40 * 40
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="snapshot save/load timings")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'slots':>9} {'size MB':>8} {'capture ms':>11} {'write ms':>9}"
+        f" {'load ms':>8} {'first tick ms':>14}"
+    )
+    # what SnapshotWriter.save costs the game thread, copying or forking, and
+    # a tick while the forked child still writes against a regular one
+    game = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "snapshot.bin")
+        for count in args.counts:
+            # half the slots stay free for projectiles
+            enemies = count // 2
+            side = int(math.sqrt(enemies * AREA_PER_ENTITY))
+            world = headless.create_world(
+                enemies, max_entities=count, width=side, height=side
+            )
+
+            start = time.perf_counter()
+            metadata, columns = snapshot.capture(world)
+            captured = time.perf_counter()
+            snapshot.write(path, metadata, columns)
+            written = time.perf_counter()
+            loaded_world = snapshot.load(
+                path, platform=headless.HeadlessPlatform(side, side)
+            )
+            loaded = time.perf_counter()
+            # pages fault in lazily, the first tick pays for touching them
+            headless.step(loaded_world, 1 / 60)
+            ticked = time.perf_counter()
+
+            print(
+                f"{count:>9} {os.path.getsize(path) / 2**20:>8.1f}"
+                f" {(captured - start) * 1e3:>11.2f}"
+                f" {(written - captured) * 1e3:>9.2f}"
+                f" {(loaded - written) * 1e3:>8.2f}"
+                f" {(ticked - loaded) * 1e3:>14.2f}"
+            )
+            # unmapping frees the replaced file, keep that out of the next load
+            del loaded_world
+
+            # the first tick builds the neighbour lists, keep it out
+            headless.step(world, 1 / 60)
+            start = time.perf_counter()
+            headless.step(world, 1 / 60)
+            result = {"slots": count, "tick_ms": (time.perf_counter() - start) * 1e3}
+            for fork in (False, True):
+                writer = snapshot.SnapshotWriter(fork=fork)
+                start = time.perf_counter()
+                writer.save(world, path)
+                saved = time.perf_counter()
+                headless.step(world, 1 / 60)
+                ticked = time.perf_counter()
+                writer.wait()
+                writer.close()
+                name = "fork" if fork else "copy"
+                result[f"{name}_ms"] = (saved - start) * 1e3
+                result[f"{name}_tick_ms"] = (ticked - saved) * 1e3
+            game.append(result)
+
+    print(
+        f"\n{'slots':>9} {'copy ms':>8} {'tick ms':>8} {'fork ms':>8}"
+        f" {'tick ms':>8} {'idle tick ms':>12}"
+    )
+    for result in game:
+        print(
+            f"{result['slots']:>9} {result['copy_ms']:>8.2f}"
+            f" {result['copy_tick_ms']:>8.2f} {result['fork_ms']:>8.2f}"
+            f" {result['fork_tick_ms']:>8.2f} {result['tick_ms']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
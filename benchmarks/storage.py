@@ -0,0 +1,154 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+import headless
+import main
+
+# python -m benchmarks.storage [--entities 20000] [--ticks 600]
+#                              [--interval 120] [--slots 1000000]
+
+# world area per entity, same density as the suite
+AREA_PER_ENTITY = 40 * 40
+DT = 1 / 60
+
+
+def create_world(entities: int, seed: int, storage: str) -> main.World:
+    side = int(math.sqrt(entities * AREA_PER_ENTITY))
+    return headless.create_world(
+        entities,
+        width=side,
+        height=side,
+        script=headless.zigzag_script(),
+        seed=seed,
+        storage=storage,
+    )
+
+
+def memory(slots: int) -> dict[str, dict[str, float]]:
+    # bytes per slot of every column per profile, groups included
+    result = {}
+    for storage in main.STORAGE_PROFILES:
+        world = main.World(
+            60, slots, headless.HeadlessPlatform(), storage=storage, seed=0
+        )
+        result[storage] = {name: size / slots for name, size in world.memory().items()}
+    return result
+
+
+def drift(world: main.World, reference: main.World) -> dict:
+    # position difference of the entities alive in both, same handle
+    slots = world.slots
+    ref = reference.slots
+    both = np.flatnonzero(
+        slots.active & ref.active & (slots.generation == ref.generation)
+    )
+    dx = slots.px[both].astype(np.float64) - ref.px[both]
+    dy = slots.py[both].astype(np.float64) - ref.py[both]
+    # wrapped around on one side only
+    dx = (dx + reference.width / 2) % reference.width - reference.width / 2
+    dy = (dy + reference.height / 2) % reference.height - reference.height / 2
+    dist = np.sqrt(dx * dx + dy * dy)
+    return {
+        "alive": len(world.entities),
+        "reference_alive": len(reference.entities),
+        "shared": len(both),
+        "max": float(dist.max()) if len(dist) else 0.0,
+        "mean": float(dist.mean()) if len(dist) else 0.0,
+    }
+
+
+def tally(world: main.World, counts: dict, enemies: int):
+    # gameplay outcome so far, projectiles spawn with this tick's time
+    projectiles = world.bhv_projectile.indices
+    counts["shots"] += int(
+        np.count_nonzero(world.slots.spawn_time[projectiles] == world.time)
+    )
+    counts["kills"] = enemies - len(world.bhv_enemy)
+    counts["alive"] = len(world.entities)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="storage profiles, memory and drift")
+    parser.add_argument("--entities", type=int, default=20_000)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--interval", type=int, default=120)
+    parser.add_argument("--slots", type=int, default=1_000_000)
+    parser.add_argument("--reference", default="precise")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"memory at {args.slots} slots")
+    print(f"{'profile':>8} {'bytes/slot':>10} {'columns':>8} {'groups':>8} {'MB':>8}")
+    for storage, columns in memory(args.slots).items():
+        total = sum(columns.values())
+        groups = sum(
+            size
+            for name, size in columns.items()
+            if name.endswith((".dense", ".sparse"))
+        )
+        print(
+            f"{storage:>8} {total:>10.0f} {total - groups:>8.0f} {groups:>8.0f}"
+            f" {total * args.slots / 2**20:>8.1f}"
+        )
+
+    worlds = {
+        storage: create_world(args.entities, args.seed, storage)
+        for storage in main.STORAGE_PROFILES
+    }
+    seconds = dict.fromkeys(worlds, 0.0)
+    enemies = {storage: len(world.bhv_enemy) for storage, world in worlds.items()}
+    counts = {storage: {"shots": 0, "kills": 0, "alive": 0} for storage in worlds}
+    # ticks each profile's outcome so far differed from the default one, a
+    # hit can land a tick apart in float64 and still end the same
+    differs: dict[str, list[int]] = {storage: [] for storage in worlds}
+    print(f"\ndrift against {args.reference}, {args.entities} entities")
+    print(
+        f"{'profile':>8} {'tick':>5} {'alive':>6} {'ref alive':>9} {'shared':>6}"
+        f" {'max px':>9} {'mean px':>9}"
+    )
+    for tick in range(1, args.ticks + 1):
+        for storage, world in worlds.items():
+            start = time.perf_counter()
+            headless.step(world, DT)
+            seconds[storage] += time.perf_counter() - start
+            tally(world, counts[storage], enemies[storage])
+        for storage in worlds:
+            if counts[storage] != counts["default"]:
+                differs[storage].append(tick)
+
+        if tick % args.interval == 0:
+            for storage, world in worlds.items():
+                if storage == args.reference:
+                    continue
+                result = drift(world, worlds[args.reference])
+                print(
+                    f"{storage:>8} {tick:>5} {result['alive']:>6}"
+                    f" {result['reference_alive']:>9} {result['shared']:>6}"
+                    f" {result['max']:>9.4f} {result['mean']:>9.4f}"
+                )
+
+    print(
+        f"\nsame seed and script, {args.ticks} ticks\n"
+        f"{'profile':>8} {'shots':>6} {'kills':>6} {'alive':>6} {'ticks/s':>8}"
+    )
+    for storage, total in seconds.items():
+        result = counts[storage]
+        print(
+            f"{storage:>8} {result['shots']:>6} {result['kills']:>6}"
+            f" {result['alive']:>6} {args.ticks / total:>8.1f}"
+        )
+    for storage, ticks in differs.items():
+        if ticks:
+            print(
+                f"{storage} differs from default on {len(ticks)} ticks,"
+                f" ticks {ticks[0]}-{ticks[-1]}"
+            )
+    for storage, result in counts.items():
+        assert result == counts["default"], f"{storage} ends differently: {result}"
+
+
+if __name__ == "__main__":
+    cli()
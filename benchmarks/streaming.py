@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+import headless
+import streaming
+
+# python -m benchmarks.streaming [--entities 10000 50000] [--clients 4]
+
+AREA_PER_ENTITY = 40 * 40
+
+
+async def _clients(port: int, clients: int, results: multiprocessing.Queue):
+    async def client() -> tuple[int, int, list[float]]:
+        replica, reader, writer = await streaming.connect("127.0.0.1", port)
+        received = 0
+        messages = 0
+        latencies = []
+        try:
+            while True:
+                message = await streaming.read_message(reader)
+                stamp = replica.apply(message)
+                # the keyframe is counted on its own by the server side
+                if messages > 0:
+                    received += streaming.FRAME.size + len(message)
+                    latencies.append(time.perf_counter() - stamp)
+                messages += 1
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+        return received, messages - 1, latencies
+
+    for result in await asyncio.gather(*(client() for _ in range(clients))):
+        results.put(result)
+
+
+def _run_clients(port: int, clients: int, results: multiprocessing.Queue):
+    asyncio.run(_clients(port, clients, results))
+
+
+async def bench(entities: int, clients: int, ticks: int, tick_rate: float) -> dict:
+    side = int(math.sqrt(entities * AREA_PER_ENTITY))
+    world = headless.create_world(
+        entities, width=side, height=side, script=headless.zigzag_script()
+    )
+    server = streaming.StreamServer(world)
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+
+    # simulated clients decode in their own process so they don't steal the
+    # server's cpu, spawned since a forked child would inherit the running loop
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_clients, args=(port, clients, results))
+    process.start()
+    while len(server.clients) < clients:
+        await asyncio.sleep(0.01)
+
+    start = time.process_time()
+    await server.run(tick_rate, ticks)
+    cpu = time.process_time() - start
+    # what a client joining now would get first
+    keyframe = len(server.encoder.keyframe(world.time))
+
+    # hanging up ends the clients, the loop has to keep running for that
+    listener.close()
+    for writer in list(server.clients):
+        writer.close()
+    received = [await asyncio.to_thread(results.get) for _ in range(clients)]
+    process.join()
+
+    latencies = np.concatenate([latency for _, _, latency in received]) * 1e3
+    return {
+        "entities": entities,
+        "clients": clients,
+        "keyframe_bytes": keyframe,
+        "bytes_per_tick": sum(size for size, _, _ in received) / clients / ticks,
+        "encode_ms": server.encode_time / ticks * 1e3,
+        "server_cpu_ms": cpu / ticks * 1e3,
+        "latency_ms": {
+            "p50": np.percentile(latencies, 50),
+            "p99": np.percentile(latencies, 99),
+        },
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="state streaming over loopback")
+    parser.add_argument("--entities", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--ticks", type=int, default=120)
+    parser.add_argument("--tick-rate", type=float, default=60)
+    args = parser.parse_args()
+
+    print(
+        f"{'entities':>9} {'clients':>7} {'keyframe KB':>11} {'KB/tick':>8}"
+        f" {'encode ms':>9} {'server ms':>9} {'lat p50':>8} {'lat p99':>8}"
+    )
+    for entities in args.entities:
+        result = asyncio.run(bench(entities, args.clients, args.ticks, args.tick_rate))
+        print(
+            f"{entities:>9} {args.clients:>7}"
+            f" {result['keyframe_bytes'] / 1024:>11.1f}"
+            f" {result['bytes_per_tick'] / 1024:>8.1f}"
+            f" {result['encode_ms']:>9.2f} {result['server_cpu_ms']:>9.2f}"
+            f" {result['latency_ms']['p50']:>8.2f}"
+            f" {result['latency_ms']['p99']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,152 @@
+import argparse
+import json
+import math
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import headless
+import main
+
+# python -m benchmarks.suite [--counts 256 4096] [--output results.json]
+#                            [--compare baseline.json]
+
+DEFAULT_COUNTS = [256, 1_024, 4_096, 16_384, 65_536, 262_144, 1_048_576]
+# world area per entity, the fake screen grows with the entity count so
+# density (and with it contacts per entity) stays constant
+AREA_PER_ENTITY = 40 * 40
+DT = 1 / 60
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_world(count: int, seed: int) -> main.World:
+    side = int(math.sqrt(count * AREA_PER_ENTITY))
+    return headless.create_world(
+        count,
+        width=side,
+        height=side,
+        script=headless.zigzag_script(),
+        seed=seed,
+    )
+
+
+def timed_step(world: main.World, timings: dict[str, float]):
+    world.platform.advance(DT)
+
+    start = time.perf_counter()
+    world.update(DT)
+    timings["world"] += time.perf_counter() - start
+
+    for system in main.SYSTEMS:
+        start = time.perf_counter()
+        system.run(world)
+        timings[system.name] += time.perf_counter() - start
+
+
+def bench(count: int, ticks: int, warmup: int, seed: int) -> dict:
+    # memory pass, tracemalloc sees numpy allocations as well
+    tracemalloc.start()
+    world = create_world(count, seed)
+    headless.run(world, warmup, DT)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # timing pass on the warmed up world
+    timings = {"world": 0.0} | {system.name: 0.0 for system in main.SYSTEMS}
+    tick_times = np.empty(ticks)
+    for tick in range(ticks):
+        start = time.perf_counter()
+        timed_step(world, timings)
+        tick_times[tick] = time.perf_counter() - start
+
+    total = tick_times.sum()
+    return {
+        "entities": count,
+        "ticks": ticks,
+        "ticks_per_sec": ticks / total,
+        "tick_ms": {
+            "mean": tick_times.mean() * 1e3,
+            "p50": np.percentile(tick_times, 50) * 1e3,
+            "p95": np.percentile(tick_times, 95) * 1e3,
+            "max": tick_times.max() * 1e3,
+        },
+        "systems_ms": {name: t / ticks * 1e3 for name, t in timings.items()},
+        "contacts": len(world.physics_system.contacts),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def compare(results: list[dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {r["entities"]: r for r in json.load(f)["results"]}
+
+    print(f"\nvs {baseline_path}")
+    print(f"{'entities':>10} {'ticks/s':>10} {'baseline':>10} {'speedup':>8}")
+    for result in results:
+        base = baseline.get(result["entities"])
+        if base is None:
+            continue
+        speedup = result["ticks_per_sec"] / base["ticks_per_sec"]
+        print(
+            f"{result['entities']:>10} {result['ticks_per_sec']:>10.1f}"
+            f" {base['ticks_per_sec']:>10.1f} {speedup:>7.2f}x"
+        )
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="headless scaling benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--ticks", type=int, default=60)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as json")
+    parser.add_argument("--compare", help="json results of another revision")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'entities':>10} {'ticks/s':>10} {'p95 ms':>8} {'peak MB':>8}  systems ms")
+    for count in args.counts:
+        result = bench(count, args.ticks, args.warmup, args.seed)
+        results.append(result)
+        systems = " ".join(f"{k}={v:.2f}" for k, v in result["systems_ms"].items())
+        print(
+            f"{count:>10} {result['ticks_per_sec']:>10.1f}"
+            f" {result['tick_ms']['p95']:>8.2f}"
+            f" {result['peak_bytes'] / 2**20:>8.1f}  {systems}"
+        )
+
+    if args.output:
+        report = {
+            "revision": revision(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "dt": DT,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    cli()
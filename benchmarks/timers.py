@@ -0,0 +1,68 @@
+import argparse
+import time
+
+import numpy as np
+
+import timers
+
+# python -m benchmarks.timers [--counts 10000 1000000] [--lifetime 1.5]
+
+DT = 1 / 60
+
+
+def bench(count: int, lifetime: float, ticks: int, seed: int) -> dict:
+    # steady state, count timers alive and as many expire per tick as spawn
+    rng = np.random.default_rng(seed)
+    spawn_time = -rng.uniform(0, lifetime, count)
+    life_time = np.full(count, lifetime)
+    handles = np.arange(count, dtype=np.int64)
+    wheel = timers.TimerWheel(DT, 0)
+    wheel.schedule(handles, spawn_time + life_time)
+
+    per_tick = round(count * DT / lifetime)
+    poll_time = 0.0
+    wheel_time = 0.0
+    fired = 0
+    for tick in range(1, ticks + 1):
+        now = tick * DT
+        # respawn in expired slots, both sides see the same timers
+        expired = np.flatnonzero(now - spawn_time > life_time)[:per_tick]
+        spawn_time[expired] = now
+        wheel.schedule(handles[expired], now + lifetime)
+
+        start = time.perf_counter()
+        np.flatnonzero(now - spawn_time > life_time)
+        poll_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fired += len(wheel.advance(now))
+        wheel_time += time.perf_counter() - start
+
+    return {
+        "fired_per_tick": fired / ticks,
+        "poll_ms": poll_time / ticks * 1e3,
+        "wheel_ms": wheel_time / ticks * 1e3,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="timer wheel against polling")
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--lifetime", type=float, default=1.5)
+    parser.add_argument("--ticks", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'timers':>9} {'fired/tick':>10} {'poll ms':>8} {'wheel ms':>8}")
+    for count in args.counts:
+        result = bench(count, args.lifetime, args.ticks, args.seed)
+        print(
+            f"{count:>9} {result['fired_per_tick']:>10.0f}"
+            f" {result['poll_ms']:>8.3f} {result['wheel_ms']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    cli()
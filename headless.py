@@ -0,0 +1,176 @@
+import argparse
+import time
+from typing import Callable, Iterable, Optional
+
+import pyray as rl
+
+import main
+
+# python headless.py [--ticks 600] [--enemies 250]
+
+# returns the keys held down on a given tick
+InputScript = Callable[[int], Iterable[rl.KeyboardKey]]
+
+
+class HeadlessPlatform(main.Platform):
+    def __init__(
+        self,
+        width: int = main.INIT_WIDTH,
+        height: int = main.INIT_HEIGHT,
+        fps: float = 60,
+        script: Optional[InputScript] = None,
+    ):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.script = script
+        self.tick = 0
+        self.time = 0.0
+        self.held: set[rl.KeyboardKey] = set()
+        self.prev_held: set[rl.KeyboardKey] = set()
+
+    def advance(self, dt: float):
+        # called once per tick before the world updates
+        self.tick += 1
+        self.time += dt
+        self.prev_held = self.held
+        self.held = set(self.script(self.tick)) if self.script else set()
+
+    def get_time(self) -> float:
+        return self.time
+
+    def get_fps(self) -> float:
+        return self.fps
+
+    def get_screen_width(self) -> int:
+        return self.width
+
+    def get_screen_height(self) -> int:
+        return self.height
+
+    def is_key_pressed(self, key: rl.KeyboardKey) -> bool:
+        return key in self.held and key not in self.prev_held
+
+    def is_key_down(self, key: rl.KeyboardKey) -> bool:
+        return key in self.held
+
+
+def zigzag_script(period: int = 120) -> InputScript:
+    # holds right then left for `period` ticks each
+    def script(tick: int) -> Iterable[rl.KeyboardKey]:
+        if (tick // period) % 2 == 0:
+            return (rl.KeyboardKey.KEY_D,)
+        return (rl.KeyboardKey.KEY_A,)
+
+    return script
+
+
+def create_world(
+    enemies: int,
+    max_entities: Optional[int] = None,
+    width: int = main.INIT_WIDTH,
+    height: int = main.INIT_HEIGHT,
+    script: Optional[InputScript] = None,
+    seed: int = 0,
+    allocate: Optional[main.Allocator] = None,
+    storage: str = "default",
+) -> main.World:
+    platform = HeadlessPlatform(width, height, script=script)
+    # leave room for projectiles
+    max_entities = max_entities or 2 * enemies + 1024
+    return main.create_world(
+        enemies, max_entities, width, height, platform, seed, allocate, storage
+    )
+
+
+def step(world: main.World, dt: float):
+    world.platform.advance(dt)
+    world.profiler.next_frame()
+    main.step(world, dt)
+
+
+def run(world: main.World, ticks: int, dt: float = 1 / 60):
+    for _ in range(ticks):
+        step(world, dt)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="run the simulation headless")
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--enemies", type=int, default=250)
+    parser.add_argument("--dt", type=float, default=1 / 60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", help="write a chrome trace (and .csv) here")
+    parser.add_argument("--restore", help="start from this snapshot")
+    parser.add_argument("--snapshot", help="write a snapshot here at the end")
+    parser.add_argument("--record", help="record the run's inputs for replay.py")
+    parser.add_argument(
+        "--storage", choices=list(main.STORAGE_PROFILES), default="default"
+    )
+    args = parser.parse_args()
+
+    if args.restore:
+        import snapshot
+
+        platform = HeadlessPlatform(script=zigzag_script())
+        world = snapshot.load(args.restore, platform=platform)
+        # resume the input script where the snapshot left off
+        platform.tick = round(world.time / args.dt)
+        platform.held = set(platform.script(platform.tick))
+    else:
+        world = create_world(
+            args.enemies,
+            script=zigzag_script(),
+            seed=args.seed,
+            storage=args.storage,
+        )
+    world.profiler.enabled = args.profile is not None
+
+    recording = None
+    if args.record:
+        import replay
+
+        assert not args.restore, "can't record a restored run"
+        recording = replay.record(
+            world,
+            args.enemies,
+            world.slots.count,
+            int(world.width),
+            int(world.height),
+            args.dt,
+            args.storage,
+        )
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        step(world, args.dt)
+        if recording is not None:
+            recording.checkpoint(world)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.ticks} ticks in {elapsed:.3f}s"
+        f" ({args.ticks / elapsed:.1f} ticks/s, {len(world.entities)} entities)"
+    )
+    memory = sum(world.memory().values())
+    print(
+        f"{memory / 2**20:.2f} MB for {world.slots.count} slots"
+        f" ({memory / world.slots.count:.0f} bytes per slot)"
+    )
+
+    if recording is not None:
+        recording.save(args.record)
+
+    if args.snapshot:
+        import snapshot
+
+        snapshot.save(world, args.snapshot)
+
+    if args.profile:
+        world.profiler.export_chrome_trace(args.profile)
+        world.profiler.export_csv(f"{args.profile.removesuffix('.json')}.csv")
+        for name, average in world.profiler.averages(args.ticks).items():
+            print(f"{name:>16}: {average:.3f}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,186 +1,472 @@
-from typing import Optional
+from typing import Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
 import time
-from enum import Enum
+from enum import Enum, IntEnum, IntFlag
 import pyray as rl
-import random
 import tools
-# import numpy as np
+import physics
+import profiler
+import timers
+import numpy as np
 
 INIT_WIDTH = 800
 INIT_HEIGHT = 600
+# the world is bigger than the window, the camera follows the player
+WORLD_WIDTH = 3200
+WORLD_HEIGHT = 2400
+# entities smaller than this many pixels on screen are drawn as points
+LOD_PIXELS = 2
+PROJECTILE_LIFETIME = 1.5
+# enemy flocking, every enemy reacts to its FLOCK_NEIGHBOURS nearest within
+# perception, closer than FLOCK_SEPARATION counts as crowding, weights of the
+# steering terms, how much of the turn happens per second and how much of the
+# gap to the steered velocity closes per second
+FLOCK_NEIGHBOURS = 8
+FLOCK_SEPARATION = 25
+FLOCK_SEPARATION_WEIGHT = 1.5
+FLOCK_ALIGNMENT_WEIGHT = 1.0
+FLOCK_COHESION_WEIGHT = 0.5
+FLOCK_TURN_RATE = 2.0
+FLOCK_ACCELERATION = 8.0
+# groups go back to slot order once this share of their members is out of it,
+# systems gather columns by group indices and sorted ones walk memory in order
+SORT_DISORDER = 1 / 16
 
 
 # ===========
 # DATA TYPES
 # ===========
-class EntityId:
-    def __init__(self, index: int = 0, generation: int = 0):
-        self.index = index
-        self.generation = generation
+# NOTE: an entity handle packs the slot index into the low bits and the slot
+# generation into the high bits of one int, the helpers below work on plain
+# ints and on numpy int64 arrays alike
+EntityId = int
 
+INDEX_BITS = 32
+INDEX_MASK = (1 << INDEX_BITS) - 1
+GENERATION_MASK = (1 << 31) - 1
 
-class EntityType(Enum):
+
+def make_entity_id(index, generation):
+    return (generation << INDEX_BITS) | index
+
+
+def entity_index(entity):
+    return entity & INDEX_MASK
+
+
+def entity_generation(entity):
+    return entity >> INDEX_BITS
+
+
+def unique(values: np.ndarray) -> np.ndarray:
+    # same as np.unique, which hashes first and is several times slower for
+    # batches of slots or handles
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=np.bool_)
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+class EntityType(IntEnum):
     NONE = 0
     PLAYER = 1
     ENEMY = 2
     PROJECTILE = 3
 
 
-class ContextType(Enum):
+class ContextType(IntEnum):
     PERSISTENT = 0
     WORLD = 1
     SCENE = 2
 
 
-class RigidbodyType(Enum):
+# NOTE: NONE bodies only report contacts, STATIC and KINEMATIC ones push
+# DYNAMIC ones around without being pushed back
+class RigidbodyType(IntEnum):
     NONE = 0
     STATIC = 1
-    KINEMATIC = 1
-    DYNAMIC = 2
+    KINEMATIC = 2
+    DYNAMIC = 3
 
 
-# TODO: LAYERS AND MASKS COULD BE ENUMS
-
-
-class Layer(Enum):
-    DEFAULT = b"0x44"
-    ENEMY = b"0x00"
-    PLAYER = b"0x00"
-    ENEMY_PROJECTILE = b"0x00"
-    PLAYER_PROJECTILE = b"0x00"
+# NOTE: two entities collide only if each one's layer is in the other's mask
+class Layer(IntFlag):
+    NONE = 0
+    DEFAULT = 1 << 0
+    ENEMY = 1 << 1
+    PLAYER = 1 << 2
+    ENEMY_PROJECTILE = 1 << 3
+    PLAYER_PROJECTILE = 1 << 4
 
 
-class Mask(Enum):
-    DEFAULT = b"0x44"
-    ENEMY = b"0x00"
-    PLAYER = b"0x00"
-    ENEMY_PROJECTILE = b"0x00"
-    PLAYER_PROJECTILE = b"0x00"
+class Mask(IntFlag):
+    NONE = 0
+    DEFAULT = Layer.DEFAULT
+    ENEMY = Layer.ENEMY | Layer.PLAYER | Layer.PLAYER_PROJECTILE
+    PLAYER = Layer.ENEMY | Layer.ENEMY_PROJECTILE
+    ENEMY_PROJECTILE = Layer.PLAYER
+    PLAYER_PROJECTILE = Layer.ENEMY
 
 
 # ============
 # ENTITY DATA
 # ============
-class EntitySlotMap:
-    def __init__(self, count):
-        assert count > 0
-        self._free_list: set[EntityId] = set()
-
-        self.active: list[bool] = []
-        self.default_active: bool = False
-
-        self.type: list[EntityType] = []
-        self.default_type: EntityType = EntityType.NONE
-
-        self.context_type: list[ContextType] = []
-        self.default_context_type: ContextType = ContextType.PERSISTENT
-
-        self.rb_type: list[RigidbodyType] = []
-        self.default_rb_type: RigidbodyType = RigidbodyType.NONE
-
-        self.color: list[rl.Color] = []
-        self.default_color: rl.Color = rl.RAYWHITE
-
-        self.px: list[float] = []
-        self.default_px: float = 0
-
-        self.py: list[float] = []
-        self.default_py: float = 0
-
-        self.look_dir_x: list[float] = []
-        self.default_look_dir_x: float = 0
-
-        self.look_dir_y: list[float] = []
-        self.default_look_dir_y: float = 0
-
-        self.vx: list[float] = []
-        self.default_vx: float = 0
+# (name, shape, dtype) -> array, lets EntitySlotMap columns live in e.g.
+# shared memory
+Allocator = Callable[[str, tuple[int, ...], type], np.ndarray]
+
+
+def allocate_array(name: str, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+    _ = name
+    return np.empty(shape, dtype=dtype)
+
+
+# NOTE: declares one EntitySlotMap column, the schema is collected into
+# EntitySlotMap.FIELDS once when the class is defined
+class Field:
+    def __init__(self, dtype: type, default, shape: tuple[int, ...] = ()):
+        self.name = ""
+        self.dtype = dtype
+        self.default = default
+        self.shape = shape
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+        owner.FIELDS = (*owner.__dict__.get("FIELDS", ()), self)
+
+
+# NOTE: storage profiles, dtypes that replace the declared ones of some
+# columns, "groups" is the dtype of the World's DenseSets. "compact" narrows
+# what the game's values fit in: health and damage stay signed since -1 means
+# invincible, generations fit 31 bits and slot indices 32. Times stay float64
+# in every profile, world time is wall clock seconds.
+# "precise" widens every continuous float32 column to float64.
+STORAGE_PROFILES: dict[str, dict[str, type]] = {
+    "default": {},
+    "compact": {
+        "groups": np.int32,
+        "generation": np.int32,
+        "collision_layer": np.uint8,
+        "collision_mask": np.uint8,
+        "weapon_fire_rate": np.float32,
+        "weapon_damage": np.int16,
+        "health": np.int16,
+        "health_max": np.int16,
+    },
+    "precise": {
+        name: np.float64
+        for name in (
+            "mass",
+            "px",
+            "py",
+            "prev_px",
+            "prev_py",
+            "look_dir_x",
+            "look_dir_y",
+            "vx",
+            "vy",
+            "speed",
+            "collider_radius",
+            "perception",
+            "weapon_radius",
+        )
+    },
+}
 
-        self.vy: list[float] = []
-        self.default_vy: float = 0
 
-        self.speed: list[int] = []
-        self.default_speed: float = 0
+# NOTE: every field is a preallocated numpy array indexed by slot, so scalar
+# reads/writes like `slots.px[index] = px` still work while systems can
+# process whole index arrays at once
+class EntitySlotMap:
+    FIELDS: tuple[Field, ...]
+
+    active = Field(np.bool_, False)
+    type = Field(np.uint8, EntityType.NONE)
+    context_type = Field(np.uint8, ContextType.PERSISTENT)
+    rb_type = Field(np.uint8, RigidbodyType.NONE)
+    # only used by DYNAMIC bodies
+    mass = Field(np.float32, 1)
+    # packed RGBA, one byte per channel
+    color = Field(np.uint8, rl.RAYWHITE, shape=(4,))
+
+    px = Field(np.float32, 0)
+    py = Field(np.float32, 0)
+    # position at the previous tick, used to interpolate when drawing
+    prev_px = Field(np.float32, 0)
+    prev_py = Field(np.float32, 0)
+    look_dir_x = Field(np.float32, 0)
+    look_dir_y = Field(np.float32, 0)
+    vx = Field(np.float32, 0)
+    vy = Field(np.float32, 0)
+    speed = Field(np.float32, 0)
+
+    collider_radius = Field(np.float32, 0)
+    # bitfields, see Layer and Mask
+    collision_layer = Field(np.uint32, Layer.DEFAULT)
+    collision_mask = Field(np.uint32, Mask.DEFAULT)
+    perception = Field(np.float32, 0)
+
+    weapon_radius = Field(np.float32, 0)
+    weapon_fire_rate = Field(np.float64, 0)
+    weapon_last_shot = Field(np.float64, 0)
+    weapon_damage = Field(np.int32, 0)
+
+    health = Field(np.int32, 0)
+    health_max = Field(np.int32, 0)  # -1 means invincible?
+
+    # world times need double precision
+    spawn_time = Field(np.float64, 0)
+    life_time = Field(np.float64, 0)  # -1 means no lifetime?
+
+    def __init__(
+        self,
+        count,
+        allocate: Optional[Allocator] = None,
+        storage: str = "default",
+    ):
+        assert count > 0
+        self.count = count
+        # where the columns live, plain process memory unless told otherwise
+        allocate = allocate or allocate_array
+        dtypes = STORAGE_PROFILES[storage]
+
+        # LIFO stack of free slot indices, the lowest index is on top
+        self._free_stack: np.ndarray = np.arange(count - 1, -1, -1, dtype=np.int64)
+        self._free_count: int = count
+
+        # bumped every time a slot is destroyed so old handles go stale
+        self.generation: np.ndarray = allocate(
+            "generation", (count,), dtypes.get("generation", np.int64)
+        )
+        self.generation[:] = 0
 
-        self.collider_radius: list[float] = []
-        self.default_collider_radius: float = 0
+        # set slots
+        for field in self.FIELDS:
+            dtype = dtypes.get(field.name, field.dtype)
+            column = allocate(field.name, (count, *field.shape), dtype)
+            column[:] = field.default
+            setattr(self, field.name, column)
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], free_count: int
+    ) -> "EntitySlotMap":
+        # adopts the columns as they are, e.g. memory mapped from a snapshot
+        slots = cls.__new__(cls)
+        slots.count = len(arrays["generation"])
+        slots._free_stack = arrays["free_stack"]
+        slots._free_count = free_count
+        slots.generation = arrays["generation"]
+        for field in cls.FIELDS:
+            setattr(slots, field.name, arrays[field.name])
+        return slots
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        # every column from_arrays needs, free_count aside
+        return {
+            "free_stack": self._free_stack,
+            "generation": self.generation,
+            **{field.name: getattr(self, field.name) for field in self.FIELDS},
+        }
+
+    @property
+    def free_count(self) -> int:
+        return self._free_count
+
+    def memory(self) -> dict[str, int]:
+        # bytes of every column
+        return {name: column.nbytes for name, column in self.arrays().items()}
+
+    def bytes_per_slot(self) -> dict[str, float]:
+        return {name: size / self.count for name, size in self.memory().items()}
+
+    def entity_ids(self, indices: np.ndarray) -> np.ndarray:
+        # current handles of the given slots, generations may be stored narrow
+        return make_entity_id(indices, self.generation[indices].astype(np.int64))
 
-        self.collision_layer: list[Layer] = []
-        self.default_collision_layer: Layer = Layer.DEFAULT
+    def is_active(self, entity: EntityId) -> bool:
+        index = entity_index(entity)
+        return bool(self.active[index]) and (
+            self.generation[index] == entity_generation(entity)
+        )
 
-        self.collision_mask: list[Mask] = []
-        self.default_collision_mask: Mask = Mask.DEFAULT
+    def are_active(self, entities: np.ndarray) -> np.ndarray:
+        indices = entity_index(entities)
+        return self.active[indices] & (
+            self.generation[indices] == entity_generation(entities)
+        )
 
-        self.perception: list[float] = []
-        self.default_perception: float = 0
+    def destroy(self, entity: EntityId):
+        # stale handles are ignored
+        if not self.is_active(entity):
+            return
+        index = entity_index(entity)
+        self.active[index] = False
+        self.generation[index] = (self.generation[index] + 1) & GENERATION_MASK
+
+        self._free_stack[self._free_count] = index
+        self._free_count += 1
+
+    def destroy_many(self, entities: np.ndarray):
+        # stale and repeated handles are ignored
+        entities = unique(entities[self.are_active(entities)])
+        indices = entity_index(entities)
+        self.active[indices] = False
+        self.generation[indices] = (self.generation[indices] + 1) & GENERATION_MASK
+
+        # pushed highest first so the lowest freed slot is on top
+        end = self._free_count + len(indices)
+        self._free_stack[self._free_count : end] = indices[::-1]
+        self._free_count = end
+
+    def reset(self, indices: int | np.ndarray):
+        # one write per field for a single slot or a whole index array
+        for field in self.FIELDS:
+            getattr(self, field.name)[indices] = field.default
 
-        self.weapon_radius: list[float] = []
-        self.default_weapon_radius: float = 0
+    def create(self) -> EntityId:
+        assert self._free_count > 0, "out of entity slots"
+        self._free_count -= 1
+        index = int(self._free_stack[self._free_count])
+
+        self.reset(index)
+        self.active[index] = True
+
+        return make_entity_id(index, int(self.generation[index]))
+
+    def create_many(self, count: int) -> np.ndarray:
+        assert self._free_count >= count, "out of entity slots"
+        # pop in the same order repeated create() calls would
+        start = self._free_count - count
+        indices = self._free_stack[start : self._free_count][::-1].copy()
+        self._free_count = start
+
+        self.reset(indices)
+        self.active[indices] = True
+
+        return make_entity_id(indices, self.generation[indices].astype(np.int64))
+
+
+# NOTE: dense/sparse set of slot indices, `dense[:size]` is a packed array of
+# the members and `sparse[index]` is the position of a member in it (-1 for
+# non members). Removing swaps the last member into the hole.
+class DenseSet:
+    def __init__(self, capacity: int, dtype: type = np.int64):
+        assert capacity > 0
+        self.dense: np.ndarray = np.empty(capacity, dtype=dtype)
+        self.sparse: np.ndarray = np.full(capacity, -1, dtype=dtype)
+        self.size: int = 0
+
+    @classmethod
+    def from_arrays(
+        cls, dense: np.ndarray, sparse: np.ndarray, size: int
+    ) -> "DenseSet":
+        members = cls.__new__(cls)
+        members.dense = dense
+        members.sparse = sparse
+        members.size = size
+        return members
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, index: int) -> bool:
+        return self.sparse[index] >= 0
+
+    @property
+    def indices(self) -> np.ndarray:
+        # contiguous view of the members, only valid until the next change
+        return self.dense[: self.size]
+
+    def add(self, index: int):
+        if self.sparse[index] >= 0:
+            return
+        self.dense[self.size] = index
+        self.sparse[index] = self.size
+        self.size += 1
 
-        self.weapon_fire_rate: list[float] = []
-        self.default_weapon_fire_rate: float = 0
+    def remove(self, index: int):
+        position = self.sparse[index]
+        if position < 0:
+            return
+        self.size -= 1
+        last = self.dense[self.size]
+        self.dense[position] = last
+        self.sparse[last] = position
+        self.sparse[index] = -1
+
+    def add_many(self, indices: np.ndarray):
+        indices = unique(indices[self.sparse[indices] < 0])
+        end = self.size + len(indices)
+        self.dense[self.size : end] = indices
+        self.sparse[indices] = np.arange(self.size, end)
+        self.size = end
+
+    def remove_many(self, indices: np.ndarray):
+        indices = unique(indices[self.sparse[indices] >= 0])
+        if len(indices) == 0:
+            return
+        if len(indices) == self.size:
+            # everything goes, e.g. an unloaded context, nothing to move
+            self.clear()
+            return
+        new_size = self.size - len(indices)
 
-        self.weapon_last_shot: list[float] = []
-        self.default_weapon_last_shot: float = 0
+        # holes below the new size get filled by surviving members above it
+        holes = self.sparse[indices]
+        holes = holes[holes < new_size]
+        self.sparse[indices] = -1
+        tail = self.dense[new_size : self.size]
+        movers = tail[self.sparse[tail] >= 0]
 
-        self.weapon_damage: list[int] = []
-        self.default_weapon_damage: float = 0
+        self.dense[holes] = movers
+        self.sparse[movers] = holes
+        self.size = new_size
 
-        self.health: list[int] = []
-        self.default_health: float = 0
+    def clear(self):
+        self.sparse[self.indices] = -1
+        self.size = 0
 
-        self.health_max: list[int] = []  # -1 means invincible?
-        self.default_health_max: float = 0
+    def disorder(self) -> int:
+        # members with a lower slot index than the one before them
+        indices = self.indices
+        return int(np.count_nonzero(indices[1:] < indices[:-1]))
 
-        self.spawn_time: list[float] = []
-        self.default_spawn_time: float = 0
+    def sort(self):
+        # restore memory order after many swap removes
+        self.dense[: self.size].sort()
+        self.sparse[self.indices] = np.arange(self.size)
 
-        self.life_time: list[float] = []  # -1 means no lifetime?
-        self.default_life_time: float = 0
 
-        # set slots
-        for i in range(count):
-            self._free_list.add(EntityId(i))
-
-            for field_name in [
-                i
-                for i in dir(self)
-                if not i.startswith("_") and not i.startswith("default")
-            ]:
-                field = getattr(self, field_name)
-                if not isinstance(field, list):
-                    continue
-                field.append(getattr(self, f"default_{field_name}"))
+# ===========
+# WORLD DATA
+# ===========
+# NOTE: everything the simulation needs from the window goes through here so
+# the world can also run without one (see headless.py)
+class Platform:
+    def get_time(self) -> float:
+        return time.time()
 
-    def is_active(self, entity: EntityId) -> bool:
-        return self.active[entity.index]
+    def get_fps(self) -> float:
+        return rl.get_fps()
 
-    def destroy(self, entity: EntityId):
-        if not self.active[entity.index]:
-            return
-        self.active[entity.index] = False
+    def get_screen_width(self) -> int:
+        return rl.get_screen_width()
 
-    def create(self) -> EntityId:
-        entity = self._free_list.pop()
+    def get_screen_height(self) -> int:
+        return rl.get_screen_height()
 
-        for field_name in [
-            i
-            for i in dir(self)
-            if not i.startswith("_") and not i.startswith("default")
-        ]:
-            field = getattr(self, field_name)
-            if not isinstance(field, list):
-                continue
-            field.append(getattr(self, f"default_{field_name}"))
+    def is_key_pressed(self, key: rl.KeyboardKey) -> bool:
+        return rl.is_key_pressed(key)
 
-        self.active[entity.index] = True
+    def is_key_down(self, key: rl.KeyboardKey) -> bool:
+        return rl.is_key_down(key)
 
-        return entity
+    def advance(self, dt: float):
+        # called once per tick before the world updates
+        pass
 
 
-# ===========
-# WORLD DATA
-# ===========
 class InputState(Enum):
     RELEASED = 0
     JUST_RELEASED = 1
@@ -193,21 +479,23 @@ class InputKey:
         self.key = key
         self.state = InputState.RELEASED
 
-    def update(self):
+    def update(self, platform: Platform):
         match self.state:
             case InputState.RELEASED:
-                if rl.is_key_pressed(self.key):
+                # held counts too, the press may have come in a frame that ran
+                # no tick and is gone by now
+                if platform.is_key_pressed(self.key) or platform.is_key_down(self.key):
                     self.state = InputState.JUST_PRESSED
             case InputState.JUST_PRESSED:
-                if rl.is_key_down(self.key):
+                if platform.is_key_down(self.key):
                     self.state = InputState.PRESSED
                 else:
                     self.state = InputState.JUST_RELEASED
             case InputState.PRESSED:
-                if not rl.is_key_down(self.key):
+                if not platform.is_key_down(self.key):
                     self.state = InputState.JUST_RELEASED
             case InputState.JUST_RELEASED:
-                if not rl.is_key_pressed(self.key):
+                if not platform.is_key_pressed(self.key):
                     self.state = InputState.RELEASED
 
 
@@ -222,16 +510,18 @@ class Inputs:
         self.right_key = InputKey(rl.KeyboardKey.KEY_D)
         self.action_key = InputKey(rl.KeyboardKey.KEY_SPACE)
 
-    def update(self):
-        inputs = [
+    def keys(self) -> list[InputKey]:
+        return [
             self.up_key,
             self.down_key,
             self.left_key,
             self.right_key,
             self.action_key,
         ]
-        for inp in inputs:
-            inp.update()
+
+    def update(self, platform: Platform):
+        for inp in self.keys():
+            inp.update(platform)
 
         self.horizontal = 0
         self.vertical = 0
@@ -246,76 +536,175 @@ class Inputs:
 
 
 class World:
-    def __init__(self, target_fps: int, max_entities: int):
+    # every DenseSet attribute, in the order snapshots store them
+    GROUPS = (
+        "entities",
+        "bhv_player",
+        "bhv_projectile",
+        "bhv_enemy",
+        "ctx_world",
+        "ctx_scene",
+        "weapon_ready",
+    )
+
+    # NOTE: slots and groups restore existing state (see snapshot.py), both
+    # are allocated empty otherwise
+    def __init__(
+        self,
+        target_fps: int,
+        max_entities: int,
+        platform: Optional[Platform] = None,
+        allocate: Optional[Allocator] = None,
+        slots: Optional[EntitySlotMap] = None,
+        groups: Optional[dict[str, DenseSet]] = None,
+        seed: Optional[int] = None,
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+        storage: str = "default",
+    ):
+        dtype = STORAGE_PROFILES[storage].get("groups", np.int64)
+        groups = groups or {name: DenseSet(max_entities, dtype) for name in self.GROUPS}
+        self.platform: Platform = platform or Platform()
         self.target_fps: float = target_fps
-        self.last_time: float = 0
-        self.time: float = time.time()
+        # entities wrap around at the world size, the screen size by default
+        self.width: float = width or self.platform.get_screen_width()
+        self.height: float = height or self.platform.get_screen_height()
+        self.time: float = self.platform.get_time()
+        self.last_time: float = self.time
         self.actual_fps: float = 0
         self.dt: float = 0
         self.inputs: Inputs = Inputs()
-        self.entities: set[EntityId] = set()  # all active entities
-        self.bhv_player: set[EntityId] = set()
-        self.bhv_projectile: set[EntityId] = set()
-        self.bhv_enemy: set[EntityId] = set()
-        self.remove_list: set[EntityId] = set()
-        self.slots = EntitySlotMap(max_entities)
-        self.physics_system = PhysicsSystem(50, 50)
-
-    def update(self):
-        self.actual_fps = rl.get_fps()
-
-        current_time = time.time()
-        self.dt = current_time - self.last_time
+        # all randomness goes through here, a fixed seed makes runs repeatable
+        self.seed: int = np.random.SeedSequence(seed).entropy
+        self.rng = np.random.default_rng(self.seed)
+        self.entities = groups["entities"]  # all active entities
+        self.bhv_player = groups["bhv_player"]
+        self.bhv_projectile = groups["bhv_projectile"]
+        self.bhv_enemy = groups["bhv_enemy"]
+        # members of every context that can be unloaded, PERSISTENT ones live
+        # until they are destroyed
+        self.ctx_world = groups["ctx_world"]
+        self.ctx_scene = groups["ctx_scene"]
+        self.contexts: dict[ContextType, DenseSet] = {
+            ContextType.WORLD: self.ctx_world,
+            ContextType.SCENE: self.ctx_scene,
+        }
+        # weapons off cooldown, they fire as soon as something is in range
+        self.weapon_ready = groups["weapon_ready"]
+        # batches of handles to destroy at the start of the next update
+        self.remove_list: list[np.ndarray] = []
+        # storage profile of fresh slots, see STORAGE_PROFILES
+        self.slots = slots or EntitySlotMap(max_entities, allocate, storage)
+        self.physics_system = PhysicsSystem(
+            50, 50, neighbour_limit=FLOCK_NEIGHBOURS, incremental=True
+        )
+        # expiry of entities with a life_time and the end of weapon cooldowns,
+        # one bucket per tick
+        self.lifetimes = timers.TimerWheel(1 / target_fps, self.time)
+        self.cooldowns = timers.TimerWheel(1 / target_fps, self.time)
+        self.profiler = profiler.Profiler()
+        # runs SYSTEMS sequentially unless replaced
+        self.scheduler = SystemScheduler(SYSTEMS)
+
+    def update(self, dt: Optional[float] = None):
+        self.actual_fps = self.platform.get_fps()
+
+        if dt is None:
+            current_time = self.platform.get_time()
+            self.dt = current_time - self.time
+        else:
+            # a fixed dt advances the world clock instead of the wall clock
+            current_time = self.time + dt
+            self.dt = dt
         self.last_time = self.time
         self.time = current_time
 
-        self.inputs.update()
-        self.physics_system.update(self.slots, self.entities)
+        self.inputs.update(self.platform)
+        # whatever the last step killed is gone before physics runs
         self._destroy_entities()
+        with self.profiler.section("physics"):
+            self.physics_system.update(
+                self.slots, self.entities.indices, self.bhv_projectile.indices
+            )
 
-    def push_destroy_entity(self, entity: EntityId):
-        self.remove_list.add(entity)
+    def memory(self) -> dict[str, int]:
+        # bytes of the slot columns and the groups, named like snapshot columns
+        memory = self.slots.memory()
+        for name in self.GROUPS:
+            group: DenseSet = getattr(self, name)
+            memory[f"{name}.dense"] = group.dense.nbytes
+            memory[f"{name}.sparse"] = group.sparse.nbytes
+        return memory
+
+    def push_destroy_entity(self, entity: EntityId | np.ndarray):
+        # accepts a single entity or a whole array of them, queued ones are
+        # destroyed together at the start of the next update
+        self.remove_list.append(np.atleast_1d(np.asarray(entity, dtype=np.int64)))
+
+    def push_unload_context(self, context: ContextType):
+        # queues every entity of the context, and of the contexts nested in
+        # it (a WORLD takes its SCENE along), as one batch
+        assert context != ContextType.PERSISTENT, "persistent entities can't unload"
+        for nested, members in self.contexts.items():
+            if nested >= context:
+                self.push_destroy_entity(self.slots.entity_ids(members.indices))
 
     def _destroy_entities(self):
-        for entity in self.remove_list:
-            index = entity.index
-            match self.slots.type[index]:
-                case EntityType.PLAYER:
-                    self.bhv_player.remove(entity)
-                case EntityType.PROJECTILE:
-                    self.bhv_player.remove(entity)
-                case EntityType.ENEMY:
-                    self.bhv_player.remove(entity)
-
-            self.entities.remove(entity)
-
-            self.slots.destroy(entity)
-
+        if not self.remove_list:
+            return
+        entities = unique(np.concatenate(self.remove_list))
         self.remove_list.clear()
-
-    def create_entity(self) -> EntityId:
+        # already destroyed or the slot was reused
+        entities = entities[self.slots.are_active(entities)]
+        indices = entity_index(entities)
+
+        types = self.slots.type[indices]
+        self.bhv_player.remove_many(indices[types == EntityType.PLAYER])
+        self.bhv_projectile.remove_many(indices[types == EntityType.PROJECTILE])
+        self.bhv_enemy.remove_many(indices[types == EntityType.ENEMY])
+        self.weapon_ready.remove_many(indices)
+        contexts = self.slots.context_type[indices]
+        for context, members in self.contexts.items():
+            members.remove_many(indices[contexts == context])
+        self.entities.remove_many(indices)
+
+        self.physics_system.forget(indices)
+        self.slots.destroy_many(entities)
+
+        # swap removes and appends mix up the order, it only depends on the
+        # members so restored snapshots sort on the same tick
+        for name in self.GROUPS:
+            group: DenseSet = getattr(self, name)
+            if group.disorder() > len(group) * SORT_DISORDER:
+                group.sort()
+
+    def create_entity(self, context: ContextType = ContextType.PERSISTENT) -> EntityId:
         entity = self.slots.create()
-        # TODO: should we move this into slots? It could be an array like px or py
-        entity.generation += 1
-        self.entities.add(entity)
+        index = entity_index(entity)
+        self.slots.context_type[index] = context
+        self.entities.add(index)
+        if context != ContextType.PERSISTENT:
+            self.contexts[context].add(index)
         return entity
 
     def create_player(self, px: float, py: float) -> EntityId:
         entity_id = self.create_entity()
-        index = entity_id.index
+        index = entity_index(entity_id)
 
         self.slots.spawn_time[index] = self.time
         self.slots.life_time[index] = -1
 
         self.slots.type[index] = EntityType.PLAYER
-        self.slots.context_type[index] = ContextType.PERSISTENT
 
         self.slots.collision_layer[index] = Layer.PLAYER
         self.slots.collision_mask[index] = Mask.PLAYER
         self.slots.collider_radius[index] = 10
+        self.slots.rb_type[index] = RigidbodyType.KINEMATIC
 
         self.slots.px[index] = px
         self.slots.py[index] = py
+        self.slots.prev_px[index] = px
+        self.slots.prev_py[index] = py
         self.slots.speed[index] = 100
 
         self.slots.color[index] = rl.BLUE
@@ -324,14 +713,27 @@ class World:
 
         self.slots.weapon_radius[index] = 100
         self.slots.weapon_fire_rate[index] = 0.5
+        self.slots.weapon_damage[index] = 10
 
         self.slots.health_max[index] = 100
         self.slots.health[index] = self.slots.health_max[index]
 
-        self.bhv_player.add(entity_id)
+        self.bhv_player.add(index)
+        self.weapon_ready.add(index)
 
         return entity_id
 
+    def create_entities(
+        self, count: int, context: ContextType = ContextType.PERSISTENT
+    ) -> np.ndarray:
+        entities = self.slots.create_many(count)
+        indices = entity_index(entities)
+        self.slots.context_type[indices] = context
+        self.entities.add_many(indices)
+        if context != ContextType.PERSISTENT:
+            self.contexts[context].add_many(indices)
+        return entities
+
     def create_projectile(
         self,
         px: float,
@@ -342,322 +744,1016 @@ class World:
         mask: Mask,
         lifetime: float,
         color: rl.Color,
+        damage: int = 0,
     ) -> EntityId:
-        entity_id = self.create_entity()
-        index = entity_id.index
+        entities = self.create_projectiles(
+            np.array([px]),
+            np.array([py]),
+            target_dir_x,
+            target_dir_y,
+            layer,
+            mask,
+            lifetime,
+            color,
+            damage,
+        )
+        return int(entities[0])
 
-        self.slots.px[index] = px
-        self.slots.py[index] = py
-        self.slots.look_dir_x[index] = target_dir_x
-        self.slots.look_dir_y[index] = target_dir_y
-        self.slots.color[index] = color
-        self.slots.collision_layer[index] = layer
-        self.slots.collision_mask[index] = mask
-        self.slots.spawn_time[index] = self.time
-        self.slots.life_time[index] = lifetime
+    # NOTE: all arguments but px/py can be scalars or arrays of the same length
+    def create_projectiles(
+        self,
+        px: np.ndarray,
+        py: np.ndarray,
+        target_dir_x: float | np.ndarray,
+        target_dir_y: float | np.ndarray,
+        layer: Layer | np.ndarray,
+        mask: Mask | np.ndarray,
+        lifetime: float | np.ndarray,
+        color: rl.Color,
+        damage: int | np.ndarray = 0,
+    ) -> np.ndarray:
+        entities = self.create_entities(len(px))
+        indices = entity_index(entities)
 
-        self.slots.type[index] = EntityType.PROJECTILE
-        self.slots.context_type[index] = ContextType.PERSISTENT
+        self.slots.px[indices] = px
+        self.slots.py[indices] = py
+        self.slots.prev_px[indices] = px
+        self.slots.prev_py[indices] = py
+        self.slots.look_dir_x[indices] = target_dir_x
+        self.slots.look_dir_y[indices] = target_dir_y
+        self.slots.color[indices] = color
+        self.slots.collision_layer[indices] = layer
+        self.slots.collision_mask[indices] = mask
+        self.slots.spawn_time[indices] = self.time
+        self.slots.life_time[indices] = lifetime
 
-        self.slots.collider_radius[index] = 2
+        self.slots.type[indices] = EntityType.PROJECTILE
 
-        self.slots.speed[index] = 100
+        self.slots.collider_radius[indices] = 2
 
-        self.slots.perception[index] = 0
+        self.slots.speed[indices] = 100
+        self.slots.vx[indices] = self.slots.look_dir_x[indices] * 100
+        self.slots.vy[indices] = self.slots.look_dir_y[indices] * 100
 
-        self.slots.weapon_radius[index] = 100
-        self.slots.weapon_fire_rate[index] = 0.5
+        self.slots.perception[indices] = 0
 
-        self.slots.health_max[index] = -1
-        self.slots.health[index] = self.slots.health_max[index]
+        self.slots.weapon_radius[indices] = 100
+        self.slots.weapon_fire_rate[indices] = 0.5
+        self.slots.weapon_damage[indices] = damage
 
-        self.bhv_projectile.add(entity_id)
+        self.slots.health_max[indices] = -1
+        self.slots.health[indices] = self.slots.health_max[indices]
 
-        return entity_id
+        self.bhv_projectile.add_many(indices)
+        self.lifetimes.schedule(entities, self.time + lifetime)
 
-    def create_enemy(self, px: float, py: float) -> EntityId:
-        entity_id = self.create_entity()
-        index = entity_id.index
+        return entities
 
-        width = rl.get_screen_width()
-        height = rl.get_screen_height()
+    def create_enemy(
+        self, px: float, py: float, context: ContextType = ContextType.SCENE
+    ) -> EntityId:
+        return int(self.create_enemies(np.array([px]), np.array([py]), context)[0])
 
-        look_dir = rl.Vector2(
-            random.randrange(-width, width), random.randrange(-height, height)
+    # NOTE: enemies belong to the scene by default, they go with it
+    def create_enemies(
+        self,
+        px: np.ndarray,
+        py: np.ndarray,
+        context: ContextType = ContextType.SCENE,
+    ) -> np.ndarray:
+        entities = self.create_entities(len(px), context)
+        indices = entity_index(entities)
+
+        width = int(self.width)
+        height = int(self.height)
+
+        # random look direction
+        look_dir_x, look_dir_y = tools.normalize_arrays(
+            self.rng.integers(-width, width, len(indices)).astype(np.float32),
+            self.rng.integers(-height, height, len(indices)).astype(np.float32),
         )
-        look_dir = tools.normalize(look_dir)
-
-        self.slots.px[index] = px
-        self.slots.py[index] = py
-        self.slots.look_dir_x[index] = look_dir.x
-        self.slots.look_dir_y[index] = look_dir.y
-        self.slots.color[index] = rl.RED
-        self.slots.collision_layer[index] = Layer.ENEMY
-        self.slots.collision_mask[index] = Mask.ENEMY
-        self.slots.spawn_time[index] = self.time
-        self.slots.life_time[index] = -1
-
-        self.slots.type[index] = EntityType.ENEMY
-        self.slots.context_type[index] = ContextType.PERSISTENT
-
-        self.slots.collider_radius[index] = 5
-
-        self.slots.speed[index] = 10
-
-        self.slots.perception[index] = 200
-
-        self.slots.weapon_radius[index] = 100
-        self.slots.weapon_fire_rate[index] = 0.5
-
-        self.slots.health_max[index] = -1
-        self.slots.health[index] = self.slots.health_max[index]
 
-        self.bhv_enemy.add(entity_id)
+        self.slots.px[indices] = px
+        self.slots.py[indices] = py
+        self.slots.prev_px[indices] = px
+        self.slots.prev_py[indices] = py
+        self.slots.look_dir_x[indices] = look_dir_x
+        self.slots.look_dir_y[indices] = look_dir_y
+        self.slots.color[indices] = rl.RED
+        self.slots.collision_layer[indices] = Layer.ENEMY
+        self.slots.collision_mask[indices] = Mask.ENEMY
+        self.slots.spawn_time[indices] = self.time
+        self.slots.life_time[indices] = -1
+
+        self.slots.type[indices] = EntityType.ENEMY
+
+        self.slots.collider_radius[indices] = 5
+        self.slots.rb_type[indices] = RigidbodyType.DYNAMIC
+        self.slots.mass[indices] = 1
+
+        self.slots.speed[indices] = 10
+
+        self.slots.perception[indices] = 200
+
+        self.slots.weapon_radius[indices] = 100
+        self.slots.weapon_fire_rate[indices] = 0.5
+
+        self.slots.health_max[indices] = 30
+        self.slots.health[indices] = self.slots.health_max[indices]
+
+        self.bhv_enemy.add_many(indices)
+
+        return entities
+
+
+# NOTE: the starting world of a session, everything random in it comes from
+# `seed` so a recording only needs these arguments to rebuild it
+def create_world(
+    enemies: int,
+    max_entities: int,
+    width: int,
+    height: int,
+    platform: Optional[Platform] = None,
+    seed: Optional[int] = None,
+    allocate: Optional[Allocator] = None,
+    storage: str = "default",
+) -> World:
+    world = World(
+        60,
+        max_entities,
+        platform,
+        allocate,
+        seed=seed,
+        width=width,
+        height=height,
+        storage=storage,
+    )
+    world.create_enemies(
+        world.rng.integers(0, width, enemies),
+        world.rng.integers(0, height, enemies),
+    )
 
-        return entity_id
+    # spawn player last so it's always on top
+    # we don't have z buffering
+    world.create_player(width / 2, height / 2)
+    return world
+
+
+# NOTE: runs the simulation at a fixed tick rate independent of the render
+# rate, `alpha` is how far the renderer is between the last two ticks
+class FixedTimestep:
+    def __init__(self, tick_rate: float, max_steps: int = 5):
+        assert tick_rate > 0 and max_steps > 0
+        self.dt: float = 1 / tick_rate
+        self.max_steps: int = max_steps
+        self.accumulator: float = 0
+        self.alpha: float = 0
+        self.last_time: Optional[float] = None
+
+    def advance(self, now: float) -> int:
+        # returns how many ticks to simulate this frame
+        if self.last_time is None:
+            self.last_time = now
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        steps = int(self.accumulator // self.dt)
+        if steps > self.max_steps:
+            # drop the backlog instead of spiraling into more and more ticks
+            steps = self.max_steps
+            self.accumulator = 0
+        else:
+            self.accumulator -= steps * self.dt
+
+        self.alpha = self.accumulator / self.dt
+        return steps
+
+
+def _inverse_mass(slots: EntitySlotMap, indices: np.ndarray) -> np.ndarray:
+    # immovable bodies have infinite mass
+    dynamic = slots.rb_type[indices] == RigidbodyType.DYNAMIC
+    return np.where(dynamic, 1 / slots.mass[indices], 0).astype(np.float32)
 
 
 class PhysicsSystem:
-    def __init__(self, cell_size_x: float, cell_size_y: float):
+    def __init__(
+        self,
+        cell_size_x: float,
+        cell_size_y: float,
+        iterations: int = 4,
+        restitution: float = 0.2,
+        skin: float = 20,
+        neighbour_limit: Optional[int] = None,
+        incremental: bool = False,
+    ):
         self.cell_size_x = cell_size_x
         self.cell_size_y = cell_size_y
-
-        self.cells: dict[rl.Vector2, list[EntityId]] = {}
-        self.contacts: list[set[EntityId]] = []
-
-    def update(self, slots: EntitySlotMap, entities: set[EntityId]):
-        # CLEAR CELLS AND CONTACTS
-        self.cells.clear()
-        self.contacts.clear()
-
-        for entity in entities:
-            index = entity.index
-            self.insertToCells(
-                entity,
-                slots.px[index],
-                slots.py[index],
-                slots.collider_radius[index],
-            )
+        # contact resolution passes per update and bounciness of impacts
+        self.iterations = iterations
+        self.restitution = restitution
+
+        # an incremental grid only moves entities that changed cells
+        self.incremental = incremental
+        grid = physics.IncrementalGrid if incremental else physics.GridIndex
+        self.grid: physics.GridIndex = grid(cell_size_x, cell_size_y)
+        # candidate pairs from the broadphase as slot indices
+        self.pairs_a: np.ndarray = np.empty(0, dtype=np.int64)
+        self.pairs_b: np.ndarray = np.empty(0, dtype=np.int64)
+        # overlapping pairs from the narrow phase, normal points from a to b
+        self.contacts: physics.Contacts = physics.Contacts.empty()
+        # first impact of every swept mover during the last step
+        self.sweeps: physics.Contacts = physics.Contacts.empty()
+        # everything touching during the last step, sweeps and overlaps, with
+        # its sorted pair keys. Compared to the step before pairs entered or
+        # stayed, exited holds the keys of pairs that stopped touching.
+        self.touching: physics.Contacts = physics.Contacts.empty()
+        self.contact_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.entered: physics.Contacts = physics.Contacts.empty()
+        self.stayed: physics.Contacts = physics.Contacts.empty()
+        self.exited: np.ndarray = np.empty(0, dtype=np.int64)
+        # pairs of destroyed slots, they exit with the next update
+        self._forgotten: np.ndarray = np.empty(0, dtype=np.int64)
+        # cached perception neighbours, rebuilt once something moved more
+        # than half the skin
+        self.neighbours = physics.NeighbourList(skin, neighbour_limit)
+
+    # NOTE: movers are swept from their previous to their current position so
+    # fast ones can't tunnel through thin colliders between two ticks
+    def update(
+        self,
+        slots: EntitySlotMap,
+        indices: np.ndarray,
+        movers: Optional[np.ndarray] = None,
+    ):
+        # BROAD PHASE
+        self.grid.build(
+            indices,
+            slots.px[indices],
+            slots.py[indices],
+            slots.collider_radius[indices],
+        )
+        self.pairs_a, self.pairs_b = self.grid.pairs()
 
         # NARROW PHASE
-        # TODO: filter by layers and masks
-        i = len(self.contacts)
-        while i > 0:
-            i -= 1
-            a, b = self.contacts[i]
-            if not tools.collides(a, b):
-                _ = self.contacts.pop()
-
-    def getCell(self, x: int, y: int) -> Optional[list[EntityId]]:
-        # to key = (y << 16) | x
-        # from key
-        # x = key & 0xFFFF      # lower 16 bits
-        # y = key >> 16         # upper 16 bits
-        self.cells.get((y << 16) | x)
-
-    def insertToCells(self, entity: EntityId, px: float, py: float, radius: float):
-        rect = rl.Rectangle(
-            px - radius,
-            py - radius,
-            radius * 2,
-            radius * 2,
+        self.contacts = physics.narrow_phase(
+            self.pairs_a,
+            self.pairs_b,
+            slots.collision_layer,
+            slots.collision_mask,
+            slots.px,
+            slots.py,
+            slots.collider_radius,
+        )
+        # RESPONSE
+        self.resolve(slots)
+
+        # CONTINUOUS
+        self.sweep(slots, movers)
+
+        # EVENTS
+        self.diff_contacts()
+
+    def resolve(self, slots: EntitySlotMap):
+        # pushes overlapping rigidbodies apart, at least one side has to be
+        # DYNAMIC and neither NONE
+        a = self.contacts.a
+        b = self.contacts.b
+        rb_a = slots.rb_type[a]
+        rb_b = slots.rb_type[b]
+        keep = (
+            (rb_a != RigidbodyType.NONE)
+            & (rb_b != RigidbodyType.NONE)
+            & ((rb_a == RigidbodyType.DYNAMIC) | (rb_b == RigidbodyType.DYNAMIC))
+        )
+        a = a[keep]
+        b = b[keep]
+        physics.resolve_contacts(
+            a,
+            b,
+            _inverse_mass(slots, a),
+            _inverse_mass(slots, b),
+            slots.px,
+            slots.py,
+            slots.vx,
+            slots.vy,
+            slots.collider_radius,
+            self.iterations,
+            self.restitution,
         )
-        area = self.getCollidingCellArea(rect)
-
-        # to key = (y << 16) | x
-        # from key
-        # x = key & 0xFFFF      # lower 16 bits
-        # y = key >> 16         # upper 16 bits
-        for x in range(int(area.width)):
-            for y in range(int(area.height)):
-                key = (y << 16) | x
-                if self.cells.get(key) is None:
-                    self.cells[key] = []
-                else:
-                    self.cells[key].append(entity)
 
-    def getCollidingCellArea(self, rect: rl.Rectangle) -> rl.Rectangle:
-        top_left = rl.Vector2(rect.x, rect.y)
-        bottom_left = rl.Vector2(rect.x + rect.width, rect.y + rect.height)
+    def sweep(self, slots: EntitySlotMap, movers: Optional[np.ndarray]):
+        if movers is None:
+            self.sweeps = physics.Contacts.empty()
+            return
+        self.sweeps = physics.first_hits(
+            physics.sweep_circles(
+                self.grid,
+                movers,
+                slots.px,
+                slots.py,
+                slots.prev_px,
+                slots.prev_py,
+                slots.collider_radius,
+                slots.collision_layer,
+                slots.collision_mask,
+            )
+        )
 
-        top_left_cell = rl.Vector2(
-            top_left.x // self.cell_size_x,
-            top_left.y // self.cell_size_y,
+    def diff_contacts(self):
+        # a swept hit wins over an overlap of the same pair, it has the time
+        # of impact
+        touching, keys = physics.touching([self.sweeps, self.contacts])
+        entered, exited = physics.contact_events(self.contact_keys, keys)
+        self.touching = touching
+        self.entered = touching.select(entered)
+        self.stayed = touching.select(~entered)
+        self.exited = np.sort(np.concatenate((exited, self._forgotten)))
+        self._forgotten = np.empty(0, dtype=np.int64)
+        self.contact_keys = keys
+
+    def forget(self, indices: np.ndarray):
+        # destroyed slots can come back as new entities, their pairs must not
+        # carry over as staying
+        lo, hi = physics.unpack_pair_keys(self.contact_keys)
+        gone = np.isin(lo, indices) | np.isin(hi, indices)
+        self._forgotten = np.concatenate((self._forgotten, self.contact_keys[gone]))
+        self.contact_keys = self.contact_keys[~gone]
+
+    def query_radius(
+        self,
+        slots: EntitySlotMap,
+        qx: np.ndarray,
+        qy: np.ndarray,
+        radius: float | np.ndarray,
+        entity_type: Optional[EntityType] = None,
+        layer: Optional[Layer] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (query, slot index, squared distance) of every entity within radius,
+        # uses the grid from the last update
+        query, index, dist2 = self._query_radius(slots, qx, qy, radius)
+        keep = slots.active[index]
+        if entity_type is not None:
+            keep &= slots.type[index] == entity_type
+        if layer is not None:
+            keep &= (slots.collision_layer[index] & layer) != 0
+        return query[keep], index[keep], dist2[keep]
+
+    def query_box(
+        self, slots: EntitySlotMap, x0: float, y0: float, x1: float, y1: float
+    ) -> np.ndarray:
+        # active slot indices of everything overlapping the box, uses the grid
+        # from the last update
+        index = self._query_box(x0, y0, x1, y1)
+        px = slots.px[index]
+        py = slots.py[index]
+        radius = slots.collider_radius[index]
+        inside = (
+            slots.active[index]
+            & (px + radius >= x0)
+            & (px - radius <= x1)
+            & (py + radius >= y0)
+            & (py - radius <= y1)
         )
-        bottom_right_cell = rl.Vector2(
-            bottom_left.x // self.cell_size_x, bottom_left.y // self.cell_size_y
+        return index[inside]
+
+    def _query_radius(
+        self,
+        slots: EntitySlotMap,
+        qx: np.ndarray,
+        qy: np.ndarray,
+        radius: float | np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return physics.query_radius(self.grid, qx, qy, radius, slots.px, slots.py)
+
+    def _query_box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        # slot indices of everything in a cell overlapping the box
+        return self.grid.indices[physics.query_box(self.grid, x0, y0, x1, y1)]
+
+    def query_nearest(
+        self,
+        slots: EntitySlotMap,
+        qx: np.ndarray,
+        qy: np.ndarray,
+        radius: float | np.ndarray,
+        k: int = 1,
+        entity_type: Optional[EntityType] = None,
+        layer: Optional[Layer] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # k nearest slot indices per query as (len(qx), k) arrays, -1 where
+        # nothing was found, `exclude` is one slot per query to skip (itself)
+        query, index, dist2 = self.query_radius(
+            slots, qx, qy, radius, entity_type, layer
         )
+        if exclude is not None:
+            keep = index != exclude[query]
+            query, index, dist2 = query[keep], index[keep], dist2[keep]
+        return physics.k_nearest(len(qx), query, index, dist2, k)
 
-        return rl.Rectangle(
-            top_left_cell.x,
-            top_left_cell.y,
-            bottom_right_cell.x - top_left_cell.x,
-            bottom_right_cell.y - top_left_cell.y,
+    def query_neighbours(
+        self,
+        slots: EntitySlotMap,
+        indices: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # (neighbour, dx, dy, counts) of every other entity of `indices` within
+        # radius of each, grouped by entity with counts[i] neighbours for
+        # entity i, neighbours are positions in indices and offsets wrap
+        # around at width and height. Uses the neighbour lists, not the grid,
+        # so any caller sees the current positions.
+        return self.neighbours.query_radius(
+            indices, slots.px[indices], slots.py[indices], radius, width, height
         )
 
 
 # =====
 # DRAW
 # =====
-def update_movement(slots: EntitySlotMap, entities: set[EntityId], dt: float):
-    width = rl.get_screen_width()
-    height = rl.get_screen_height()
-
-    for entity in entities:
-        index = entity.index
-
-        vx = slots.vx[index]
-        vy = slots.vy[index]
-
-        new_px = slots.px[index] + vx * dt
-        new_py = slots.py[index] + vy * dt
+def update_movement(
+    slots: EntitySlotMap,
+    indices: np.ndarray,
+    dt: float,
+    width: float,
+    height: float,
+):
+    step_x = slots.vx[indices] * dt
+    step_y = slots.vy[indices] * dt
+    new_px = slots.px[indices] + step_x
+    new_py = slots.py[indices] + step_y
 
-        if new_px < 0:
-            new_px = width
-        if new_px > width:
-            new_px = 0
-        if new_py < 0:
-            new_py = height
-        if new_py > height:
-            new_py = 0
+    # wrap around the world edges
+    new_px[new_px < 0] = width
+    new_px[new_px > width] = 0
+    new_py[new_py < 0] = height
+    new_py[new_py > height] = 0
 
-        # update position
-        slots.px[index] = new_px
-        slots.py[index] = new_py
+    # update position, the previous position is taken relative to the
+    # wrapped one so drawing doesn't interpolate across the world
+    slots.prev_px[indices] = new_px - step_x
+    slots.prev_py[indices] = new_py - step_y
+    slots.px[indices] = new_px
+    slots.py[indices] = new_py
 
 
 # NOTE: entities are weapons
-def update_weapon(world: World, slots: EntitySlotMap, entities: set[EntityId]):
-    for entity in entities:
-        index = entity.index
-        if slots.type[index] != EntityType.PROJECTILE:
-            continue
-
-        fire_rate = slots.weapon_fire_rate[index]
-        last_shot = slots.weapon_last_shot[index]
-        if world.time - last_shot < fire_rate:
-            continue
-
-        # TODO: check for nearest enemy
-        pass
-
-
-def update_bhv_player(world: World, slots: EntitySlotMap, players: set[EntityId]):
-    for player in players:
-        index = player.index
-
-        speed = slots.speed[index]
-        slots.vx[index] = world.inputs.horizontal * speed
-        slots.vy[index] = world.inputs.vertical * speed
-
-
-def update_bhv_projectile(
-    world: World, slots: EntitySlotMap, projectiles: set[EntityId]
-):
-    for projectile in projectiles:
-        index = projectile.index
+# NOTE: only weapons off cooldown are looked at, a weapon that fires leaves
+# weapon_ready until its cooldown timer brings it back
+def update_weapon(world: World, slots: EntitySlotMap, armed: DenseSet):
+    cooled = world.cooldowns.advance(world.time)
+    armed.add_many(entity_index(cooled[slots.are_active(cooled)]))
+    ready = armed.indices
+
+    # nearest enemy in weapon range
+    px = slots.px[ready]
+    py = slots.py[ready]
+    targets, _ = world.physics_system.query_nearest(
+        slots, px, py, slots.weapon_radius[ready], entity_type=EntityType.ENEMY
+    )
+    # skip shots that don't fit into the remaining slots
+    found = np.flatnonzero(targets[:, 0] >= 0)[: slots.free_count]
+    if len(found) == 0:
+        return
+    ready = ready[found]
+    targets = targets[found, 0]
+    px = px[found]
+    py = py[found]
+
+    dir_x, dir_y = tools.normalize_arrays(
+        slots.px[targets] - px, slots.py[targets] - py
+    )
+    world.create_projectiles(
+        px,
+        py,
+        dir_x,
+        dir_y,
+        Layer.PLAYER_PROJECTILE,
+        Mask.PLAYER_PROJECTILE,
+        PROJECTILE_LIFETIME,
+        rl.YELLOW,
+        slots.weapon_damage[ready],
+    )
+    slots.weapon_last_shot[ready] = world.time
+    armed.remove_many(ready)
+    world.cooldowns.schedule(
+        slots.entity_ids(ready),
+        # float64 like world.time, a float32 sum would come due early
+        world.time + slots.weapon_fire_rate[ready].astype(np.float64),
+    )
+
+
+def update_bhv_player(world: World, slots: EntitySlotMap, players: np.ndarray):
+    speed = slots.speed[players]
+    slots.vx[players] = world.inputs.horizontal * speed
+    slots.vy[players] = world.inputs.vertical * speed
+
+
+def update_lifetimes(world: World):
+    # handles of entities destroyed early are stale, destruction skips them
+    expired = world.lifetimes.advance(world.time)
+    if len(expired) > 0:
+        world.push_destroy_entity(expired)
+
+
+# NOTE: flocking, every enemy steers away from enemies that are too close,
+# along with the heading of the ones it perceives and towards their center
+def update_bhv_enemy(world: World, slots: EntitySlotMap, enemies: np.ndarray):
+    look_x = slots.look_dir_x[enemies]
+    look_y = slots.look_dir_y[enemies]
+    neighbour, dx, dy, counts = world.physics_system.query_neighbours(
+        slots, enemies, slots.perception[enemies], world.width, world.height
+    )
+    if len(neighbour) > 0:
+        # separation, pushed harder the closer a neighbour is
+        dist2 = dx * dx + dy * dy
+        close = dist2 < FLOCK_SEPARATION * FLOCK_SEPARATION
+        push = np.where(close, -1 / np.maximum(dist2, 1), 0)
+        separation = tools.normalize_arrays(
+            physics.segment_sum(dx * push, counts),
+            physics.segment_sum(dy * push, counts),
+        )
+        alignment = tools.normalize_arrays(
+            physics.segment_sum(look_x[neighbour], counts),
+            physics.segment_sum(look_y[neighbour], counts),
+        )
+        cohesion = tools.normalize_arrays(
+            physics.segment_sum(dx, counts), physics.segment_sum(dy, counts)
+        )
 
-        life_time = slots.life_time[index]
-        spawn_time = slots.spawn_time[index]
-        # get world time and check for delta time
-        if world.time - spawn_time > life_time:
-            world.push_destroy_entity(projectile)
+        desired_x, desired_y = tools.normalize_arrays(
+            look_x
+            + separation[0] * FLOCK_SEPARATION_WEIGHT
+            + alignment[0] * FLOCK_ALIGNMENT_WEIGHT
+            + cohesion[0] * FLOCK_COHESION_WEIGHT,
+            look_y
+            + separation[1] * FLOCK_SEPARATION_WEIGHT
+            + alignment[1] * FLOCK_ALIGNMENT_WEIGHT
+            + cohesion[1] * FLOCK_COHESION_WEIGHT,
+        )
+        # turn towards the desired heading, a zero one keeps the old heading
+        turn = min(FLOCK_TURN_RATE * world.dt, 1)
+        new_x, new_y = tools.normalize_arrays(
+            look_x + (desired_x - look_x) * turn,
+            look_y + (desired_y - look_y) * turn,
+        )
+        steered = (new_x != 0) | (new_y != 0)
+        look_x = np.where(steered, new_x, look_x).astype(np.float32)
+        look_y = np.where(steered, new_y, look_y).astype(np.float32)
+        slots.look_dir_x[enemies] = look_x
+        slots.look_dir_y[enemies] = look_y
+
+    # velocity eases towards the heading at full speed instead of being
+    # replaced, contact impulses of the response fade out over a few ticks
+    speed = slots.speed[enemies]
+    accelerate = min(FLOCK_ACCELERATION * world.dt, 1)
+    vx = slots.vx[enemies]
+    vy = slots.vy[enemies]
+    slots.vx[enemies] = vx + (look_x * speed - vx) * accelerate
+    slots.vy[enemies] = vy + (look_y * speed - vy) * accelerate
+
+
+# NOTE: contact damage, projectiles hurt the mortal entities they start
+# touching by their weapon_damage. The weapon_damage of a shooter is what its
+# projectiles carry, its body touching something does no harm. Hits are
+# summed per target so any number of them count within one tick, a
+# projectile only hits the first thing it touched and is used up by it. The
+# dead and the spent go in one batch.
+def update_damage(world: World, slots: EntitySlotMap, entered: physics.Contacts):
+    # every new contact both ways as attacker -> target
+    attacker = np.concatenate((entered.a, entered.b))
+    target = np.concatenate((entered.b, entered.a))
+    toi = np.concatenate((entered.toi, entered.toi))
+    hit = (
+        (slots.type[attacker] == EntityType.PROJECTILE)
+        & (slots.weapon_damage[attacker] > 0)
+        & (slots.health_max[target] > 0)
+    )
+    attacker = attacker[hit]
+    target = target[hit]
+    if len(attacker) == 0:
+        return
+
+    # earliest hit of every projectile, ties go to the lower slot
+    order = np.lexsort((target, toi[hit], attacker))
+    attacker = attacker[order]
+    target = target[order]
+    first = np.ones(len(attacker), dtype=np.bool_)
+    np.not_equal(attacker[1:], attacker[:-1], out=first[1:])
+    attacker = attacker[first]
+    target = target[first]
+
+    targets, hits = np.unique(target, return_inverse=True)
+    damage = np.bincount(hits, slots.weapon_damage[attacker], len(targets))
+    slots.health[targets] -= damage.astype(slots.health.dtype)
+    dead = targets[slots.health[targets] <= 0]
+    world.push_destroy_entity(slots.entity_ids(np.concatenate((dead, attacker))))
+
+
+# NOTE: a system declares the slot fields and world resources it reads and
+# writes, two systems conflict if one writes something the other touches
+class System:
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[World], None],
+        reads: tuple[str, ...] = (),
+        writes: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.run = run
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+
+    def conflicts(self, other: "System") -> bool:
+        return bool(
+            self.writes & (other.reads | other.writes) or other.writes & self.reads
+        )
 
 
-def update_bhv_enemy(
-    physics_system: PhysicsSystem,
-    slots: EntitySlotMap,
-    enemies: set[EntityId],
-    dt: float,
-):
-    _ = physics_system
-    for enemy in enemies:
-        index = enemy.index
-        look_dir_x = slots.look_dir_x[index]
-        look_dir_y = slots.look_dir_y[index]
-        speed = slots.speed[index]
-        slots.vx[index] = look_dir_x * speed * dt
-        slots.vy[index] = look_dir_y * speed * dt
+# NOTE: groups systems into stages, a system goes into the stage after the
+# last earlier system it conflicts with, so conflicting systems keep their
+# order. Systems of one stage run at the same time on a thread pool, which
+# only pays off for numpy kernels that release the GIL.
+class SystemScheduler:
+    def __init__(self, systems: list[System], workers: int = 1):
+        self.systems = systems
+        self.pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        # wall time of every stage and run time of every system, last frame
+        self.stage_times: list[float] = []
+        self.system_times: dict[str, float] = {}
+
+    def stages(self) -> list[list[System]]:
+        stage_of: list[int] = []
+        for i, system in enumerate(self.systems):
+            stage = 0
+            for j in range(i):
+                if system.conflicts(self.systems[j]):
+                    stage = max(stage, stage_of[j] + 1)
+            stage_of.append(stage)
+
+        stages: list[list[System]] = [[] for _ in range(max(stage_of, default=-1) + 1)]
+        for system, stage in zip(self.systems, stage_of):
+            stages[stage].append(system)
+        return stages
+
+    @property
+    def parallelism(self) -> float:
+        # summed system time over summed stage time, 1 means sequential
+        wall = sum(self.stage_times)
+        return sum(self.system_times.values()) / wall if wall > 0 else 1
+
+    def run(self, world: World):
+        self.stage_times.clear()
+        self.system_times.clear()
+
+        for i, stage in enumerate(self.stages()):
+            start = time.perf_counter_ns()
+            if self.pool is None or len(stage) == 1:
+                timings = [_timed(system, world) for system in stage]
+            else:
+                timings = list(self.pool.map(_timed, stage, [world] * len(stage)))
+            end = time.perf_counter_ns()
+
+            # record from this thread, the profiler isn't thread safe
+            world.profiler.span(f"stage_{i}", start, end - start)
+            self.stage_times.append((end - start) / 1e9)
+            for system, (system_start, system_end) in zip(stage, timings):
+                world.profiler.span(
+                    system.name, system_start, system_end - system_start
+                )
+                self.system_times[system.name] = (system_end - system_start) / 1e9
+
+
+def _timed(system: System, world: World) -> tuple[int, int]:
+    start = time.perf_counter_ns()
+    system.run(world)
+    return start, time.perf_counter_ns()
+
+
+# all simulation systems in update order, World.update runs before them
+SYSTEMS: list[System] = [
+    System(
+        "damage",
+        lambda world: update_damage(world, world.slots, world.physics_system.entered),
+        reads=("physics", "type", "weapon_damage", "health_max"),
+        writes=("health", "remove_list"),
+    ),
+    System(
+        "movement",
+        lambda world: update_movement(
+            world.slots,
+            world.entities.indices,
+            world.dt,
+            world.width,
+            world.height,
+        ),
+        reads=("entities", "px", "py", "vx", "vy"),
+        writes=("px", "py", "prev_px", "prev_py"),
+    ),
+    System(
+        "weapon",
+        lambda world: update_weapon(world, world.slots, world.weapon_ready),
+        reads=(
+            "weapon_ready",
+            "cooldowns",
+            "physics",
+            "type",
+            "px",
+            "py",
+            "weapon_radius",
+            "weapon_fire_rate",
+            "weapon_last_shot",
+        ),
+        # NOTE: spawned projectiles only touch fresh slots, which other systems
+        # can't see before they join entities and bhv_projectile
+        writes=(
+            "weapon_last_shot",
+            "weapon_ready",
+            "cooldowns",
+            "entities",
+            "bhv_projectile",
+            "lifetimes",
+        ),
+    ),
+    System(
+        "lifetime",
+        update_lifetimes,
+        reads=("lifetimes",),
+        writes=("lifetimes", "remove_list"),
+    ),
+    System(
+        "bhv_player",
+        lambda world: update_bhv_player(world, world.slots, world.bhv_player.indices),
+        reads=("bhv_player", "inputs", "speed"),
+        writes=("vx", "vy"),
+    ),
+    System(
+        "bhv_enemy",
+        lambda world: update_bhv_enemy(world, world.slots, world.bhv_enemy.indices),
+        reads=("bhv_enemy", "px", "py", "vx", "vy", "perception", "speed"),
+        writes=("look_dir_x", "look_dir_y", "vx", "vy", "neighbours"),
+    ),
+]
+
+
+def step(world: World, dt: Optional[float] = None):
+    neighbours = world.physics_system.neighbours
+    rebuilds = neighbours.rebuilds
+    with world.profiler.section("world"):
+        world.update(dt)
+    world.scheduler.run(world)
+
+    world.profiler.count("entities", len(world.entities))
+    world.profiler.count("contacts", len(world.physics_system.contacts))
+    world.profiler.count("sweeps", len(world.physics_system.sweeps))
+    world.profiler.count("neighbours", len(neighbours))
+    # this tick's, not since the start
+    world.profiler.count("neighbour_rebuilds", neighbours.rebuilds - rebuilds)
+    if world.physics_system.incremental:
+        world.profiler.count("grid_moved", world.physics_system.grid.moved)
 
 
 # =====
 # DRAW
 # =====
-def draw_player(slots: EntitySlotMap, players: set[EntityId]):
-    for player in players:
-        index = player.index
+def interpolate(slots: EntitySlotMap, index: int, alpha: float) -> tuple[float, float]:
+    prev_px = slots.prev_px[index]
+    prev_py = slots.prev_py[index]
+    px = prev_px + (slots.px[index] - prev_px) * alpha
+    py = prev_py + (slots.py[index] - prev_py) * alpha
+    return px, py
 
-        px = slots.px[index]
-        py = slots.py[index]
+
+def draw_player(slots: EntitySlotMap, players: np.ndarray, alpha: float = 1):
+    for index in players.tolist():
+        px, py = interpolate(slots, index, alpha)
         radius = slots.collider_radius[index]
-        color = slots.color[index]
+        color = tuple(slots.color[index])
 
         rl.draw_rectangle(
             int(px - radius),
             int(py - radius),
-            radius * 2,
-            radius * 2,
+            int(radius * 2),
+            int(radius * 2),
             color,
         )
 
 
-def draw_enemy(slots: EntitySlotMap, enemies: set[EntityId]):
-    for enemy in enemies:
-        index = enemy.index
-
-        px = slots.px[index]
-        py = slots.py[index]
+def draw_enemy(slots: EntitySlotMap, enemies: np.ndarray, alpha: float = 1):
+    for index in enemies.tolist():
+        px, py = interpolate(slots, index, alpha)
         radius = slots.collider_radius[index]
-        color = slots.color[index]
+        color = tuple(slots.color[index])
 
         rl.draw_circle(int(px), int(py), radius, color)
 
 
-def draw_projectile(slots: EntitySlotMap, projectiles: set[EntityId]):
-    for projectile in projectiles:
-        index = projectile.index
-
-        px = slots.px[index]
-        py = slots.py[index]
+def draw_projectile(slots: EntitySlotMap, projectiles: np.ndarray, alpha: float = 1):
+    for index in projectiles.tolist():
+        px, py = interpolate(slots, index, alpha)
         rad = slots.collider_radius[index]
-        color = slots.color[index]
+        color = tuple(slots.color[index])
 
         rl.draw_polygon(rl.Vector2(px, py), 3, rad, 0, color)
 
 
-def main():
-    target_fps = 60
-    max_entities = 2048
+def draw_points(
+    slots: EntitySlotMap, indices: np.ndarray, camera: "Camera", alpha: float = 1
+):
+    # one pixel per entity in screen space, outside of camera mode
+    prev_px = slots.prev_px[indices]
+    prev_py = slots.prev_py[indices]
+    sx, sy = camera.to_screen(
+        prev_px + (slots.px[indices] - prev_px) * alpha,
+        prev_py + (slots.py[indices] - prev_py) * alpha,
+    )
+    for x, y, color in zip(
+        sx.astype(np.int32).tolist(),
+        sy.astype(np.int32).tolist(),
+        slots.color[indices].tolist(),
+    ):
+        rl.draw_pixel(x, y, tuple(color))
+
+
+# NOTE: centers its target on screen, the target is clamped so the view
+# stays inside the world where the world is bigger than the view
+class Camera:
+    def __init__(self, zoom: float = 1):
+        self.target_x: float = 0
+        self.target_y: float = 0
+        self.zoom: float = zoom
+        self.screen_width: int = INIT_WIDTH
+        self.screen_height: int = INIT_HEIGHT
+
+    def follow(
+        self,
+        x: float,
+        y: float,
+        world_width: float,
+        world_height: float,
+        screen_width: int,
+        screen_height: int,
+    ):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        half_width = screen_width / 2 / self.zoom
+        half_height = screen_height / 2 / self.zoom
+        if world_width > 2 * half_width:
+            x = min(max(x, half_width), world_width - half_width)
+        else:
+            x = world_width / 2
+        if world_height > 2 * half_height:
+            y = min(max(y, half_height), world_height - half_height)
+        else:
+            y = world_height / 2
+        self.target_x = x
+        self.target_y = y
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        # visible world rectangle as x0, y0, x1, y1
+        half_width = self.screen_width / 2 / self.zoom
+        half_height = self.screen_height / 2 / self.zoom
+        return (
+            self.target_x - half_width,
+            self.target_y - half_height,
+            self.target_x + half_width,
+            self.target_y + half_height,
+        )
+
+    def to_screen(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return (
+            (x - self.target_x) * self.zoom + self.screen_width / 2,
+            (y - self.target_y) * self.zoom + self.screen_height / 2,
+        )
+
+    def to_raylib(self) -> rl.Camera2D:
+        return rl.Camera2D(
+            rl.Vector2(self.screen_width / 2, self.screen_height / 2),
+            rl.Vector2(self.target_x, self.target_y),
+            0,
+            self.zoom,
+        )
+
+
+# NOTE: only what the grid finds in the view gets drawn. The grid is built at
+# the start of the tick, so the view is grown by CULL_MARGIN for what moved
+# since, and projectiles spawned this tick show up one tick late.
+CULL_MARGIN = 32
+
+
+def draw_world(world: World, camera: Camera, alpha: float = 1) -> int:
+    # returns the number of draw calls made for entities
+    slots = world.slots
+    x0, y0, x1, y1 = camera.bounds()
+    with world.profiler.section("cull"):
+        visible = world.physics_system.query_box(
+            slots,
+            x0 - CULL_MARGIN,
+            y0 - CULL_MARGIN,
+            x1 + CULL_MARGIN,
+            y1 + CULL_MARGIN,
+        )
+        detailed = slots.collider_radius[visible] * camera.zoom >= LOD_PIXELS
+        points = visible[~detailed]
+        visible = visible[detailed]
+        kind = slots.type[visible]
+
+    rl.begin_mode_2d(camera.to_raylib())
+    rl.draw_rectangle_lines(0, 0, int(world.width), int(world.height), rl.DARKGRAY)
+    with world.profiler.section("draw_player"):
+        draw_player(slots, visible[kind == EntityType.PLAYER], alpha)
+    with world.profiler.section("draw_projectile"):
+        draw_projectile(slots, visible[kind == EntityType.PROJECTILE], alpha)
+    with world.profiler.section("draw_enemy"):
+        draw_enemy(slots, visible[kind == EntityType.ENEMY], alpha)
+    rl.end_mode_2d()
+
+    with world.profiler.section("draw_points"):
+        draw_points(slots, points, camera, alpha)
+    return len(visible) + len(points)
+
+
+def main(
+    shards: int = 0,
+    threads: int = 1,
+    seed: Optional[int] = None,
+    record: Optional[str] = None,
+):
+    tick_rate = 60
+    enemies = 2000
+    # leave room for projectiles
+    max_entities = 2 * enemies + 1024
 
     rl.init_window(INIT_WIDTH, INIT_HEIGHT, "SoAsteroids")
     rl.set_target_fps(60)
 
-    world = World(target_fps, max_entities)
-    for _ in range(250):
-        world.create_enemy(
-            random.randrange(0, INIT_WIDTH),
-            random.randrange(0, INIT_HEIGHT),
+    # optionally simulate in worker processes on shared memory slots
+    arrays = None
+    if shards > 0:
+        import sharding
+
+        arrays = sharding.SharedArrays()
+
+    world = create_world(
+        enemies, max_entities, WORLD_WIDTH, WORLD_HEIGHT, seed=seed, allocate=arrays
+    )
+    world.scheduler = SystemScheduler(SYSTEMS, threads)
+
+    simulation = None
+    if arrays is not None:
+        simulation = sharding.ShardedSimulation(world, arrays, shards)
+
+    import snapshot
+
+    # a forked child would see shared memory columns change under it
+    writer = snapshot.SnapshotWriter(fork=arrays is None)
+
+    timestep = FixedTimestep(tick_rate)
+
+    # record the inputs of this session for replay.py
+    recording = None
+    if record is not None:
+        import replay
+
+        recording = replay.record(
+            world, enemies, max_entities, WORLD_WIDTH, WORLD_HEIGHT, timestep.dt
         )
 
-    # spawn player last so it's always on top
-    # we don't have z buffering
-    world.create_player(INIT_WIDTH / 2, INIT_HEIGHT / 2)
+    camera = Camera()
 
     while not rl.window_should_close():
+        # F5 writes a snapshot in the background
+        if rl.is_key_pressed(rl.KeyboardKey.KEY_F5):
+            writer.save(world, "snapshot.bin")
+        # F3 toggles the profiler overlay, F4 exports what it recorded
+        if rl.is_key_pressed(rl.KeyboardKey.KEY_F3):
+            world.profiler.enabled = not world.profiler.enabled
+        if rl.is_key_pressed(rl.KeyboardKey.KEY_F4):
+            world.profiler.export_chrome_trace("profile.json")
+            world.profiler.export_csv("profile.csv")
+        world.profiler.next_frame()
+        # the mouse wheel zooms, down to the whole world on screen
+        zoom_out = min(
+            rl.get_screen_width() / world.width, rl.get_screen_height() / world.height
+        )
+        camera.zoom = min(
+            max(camera.zoom * 1.1 ** rl.get_mouse_wheel_move(), zoom_out), 4
+        )
+
         # =======
         # UPDATE
         # =======
 
-        # update world
-        world.update()
-
-        # update systems
-        update_movement(world.slots, world.entities, world.dt)
-        update_weapon(world, world.slots, world.entities)
-
-        update_bhv_projectile(world, world.slots, world.bhv_projectile)
-        update_bhv_player(world, world.slots, world.bhv_player)
-        update_bhv_enemy(world.physics_system, world.slots, world.bhv_enemy, world.dt)
+        # update world and systems at a fixed rate
+        for _ in range(timestep.advance(world.platform.get_time())):
+            world.platform.advance(timestep.dt)
+            if simulation is None:
+                step(world, timestep.dt)
+            else:
+                sharding.step(world, simulation, timestep.dt)
+            if recording is not None:
+                recording.checkpoint(world)
 
         # =====
         # DRAW
@@ -665,16 +1761,49 @@ def main():
         rl.begin_drawing()
         rl.clear_background(rl.BLACK)
 
-        draw_player(world.slots, world.bhv_player)
-        draw_projectile(world.slots, world.bhv_projectile)
-        draw_enemy(world.slots, world.bhv_enemy)
+        if len(world.bhv_player) > 0:
+            px, py = interpolate(
+                world.slots, int(world.bhv_player.indices[0]), timestep.alpha
+            )
+            camera.follow(
+                px,
+                py,
+                world.width,
+                world.height,
+                rl.get_screen_width(),
+                rl.get_screen_height(),
+            )
+        draw_calls = draw_world(world, camera, timestep.alpha)
+        world.profiler.count("draw_calls", draw_calls)
 
         offset_y = 0
         rl.draw_fps(0, offset_y)
+        if world.profiler.enabled:
+            profiler.draw_overlay(world.profiler, 0, offset_y + 24)
 
         rl.end_drawing()
     rl.close_window()
+    writer.close()
+
+    if recording is not None:
+        recording.save(record)
+
+    if simulation is not None:
+        simulation.close()
+        arrays.close()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SoAsteroids")
+    parser.add_argument(
+        "--shards", type=int, default=0, help="simulate in this many worker processes"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=1, help="run independent systems in parallel"
+    )
+    parser.add_argument("--seed", type=int, help="seed of the world rng")
+    parser.add_argument("--record", help="record the session's inputs to this file")
+    args = parser.parse_args()
+    main(args.shards, args.threads, args.seed, args.record)
@@ -0,0 +1,1086 @@
+from typing import Optional
+
+import numpy as np
+
+# Array kernels used by PhysicsSystem. Everything here works on plain numpy
+# arrays so it can be benchmarked and checked without a World.
+
+
+def cell_ranges(
+    px: np.ndarray,
+    py: np.ndarray,
+    radius: np.ndarray,
+    cell_size_x: float,
+    cell_size_y: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # inclusive range of cells covered by the bounding box of each circle
+    x0 = np.floor((px - radius) / cell_size_x).astype(np.int64)
+    y0 = np.floor((py - radius) / cell_size_y).astype(np.int64)
+    x1 = np.floor((px + radius) / cell_size_x).astype(np.int64)
+    y1 = np.floor((py + radius) / cell_size_y).astype(np.int64)
+    return x0, y0, x1, y1
+
+
+def _kth_smallest(values: np.ndarray, counts: np.ndarray, k: int) -> np.ndarray:
+    # k-th smallest value of every segment, values holds the segments back to
+    # back with counts[i] values each, inf where a segment has less than k
+    kth = np.full(len(counts), np.inf, dtype=values.dtype)
+    width = int(counts.max()) if len(counts) else 0
+    if width < k:
+        return kth
+    # one padded row per segment, partitioning rows beats sorting segments
+    table = np.full((len(counts), width), np.inf, dtype=values.dtype)
+    row = np.repeat(np.arange(len(counts)), counts)
+    column = np.arange(len(values)) - np.repeat(np.cumsum(counts) - counts, counts)
+    table[row, column] = values
+    return np.partition(table, k - 1, axis=1)[:, k - 1]
+
+
+def _expand(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # for every element repeated counts[i] times: (element, 0..counts[i]-1)
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    local = np.arange(total) - np.repeat(starts, counts)
+    return owner, local
+
+
+def _cover(
+    x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray, cols: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # (owner, cell key) for every cell of every range, owner is the position
+    # of the range
+    width = x1 - x0 + 1
+    owner, local = _expand(width * (y1 - y0 + 1))
+    cx = x0[owner] + local % width[owner]
+    cy = y0[owner] + local // width[owner]
+    return owner, cy * cols + cx
+
+
+class GridIndex:
+    def __init__(self, cell_size_x: float, cell_size_y: float):
+        self.cell_size_x = cell_size_x
+        self.cell_size_y = cell_size_y
+        self.clear()
+
+    def clear(self):
+        # cell coordinates are stored relative to the origin cell
+        self.origin_x: int = 0
+        self.origin_y: int = 0
+        self.cols: int = 0
+        self.rows: int = 0
+
+        # per entity, in the order they were passed to build()
+        self.indices: np.ndarray = np.empty(0, dtype=np.int64)
+        self.x0: np.ndarray = np.empty(0, dtype=np.int64)
+        self.y0: np.ndarray = np.empty(0, dtype=np.int64)
+        self.x1: np.ndarray = np.empty(0, dtype=np.int64)
+        self.y1: np.ndarray = np.empty(0, dtype=np.int64)
+
+        # (cell key, entity) entries sorted by key
+        self.entry_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.entries: np.ndarray = np.empty(0, dtype=np.int64)
+
+        # one row per occupied cell, entries[cell_start:cell_start + cell_count]
+        self.cell_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.cell_start: np.ndarray = np.empty(0, dtype=np.int64)
+        self.cell_count: np.ndarray = np.empty(0, dtype=np.int64)
+
+    def build(
+        self,
+        indices: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+    ):
+        self.clear()
+        if len(indices) == 0:
+            return
+        self.indices = indices
+
+        x0, y0, x1, y1 = cell_ranges(px, py, radius, self.cell_size_x, self.cell_size_y)
+        self.origin_x = int(x0.min())
+        self.origin_y = int(y0.min())
+        x0 -= self.origin_x
+        x1 -= self.origin_x
+        y0 -= self.origin_y
+        y1 -= self.origin_y
+        self.cols = int(x1.max()) + 1
+        self.rows = int(y1.max()) + 1
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+
+        owner, keys = _cover(x0, y0, x1, y1, self.cols)
+        order = np.argsort(keys, kind="stable")
+        self.entry_keys = keys[order]
+        self.entries = owner[order]
+        self._index_cells()
+
+    def _index_cells(self):
+        # compact cell index of the sorted entries
+        boundary = np.empty(len(self.entry_keys), dtype=np.bool_)
+        boundary[:1] = True
+        np.not_equal(self.entry_keys[1:], self.entry_keys[:-1], out=boundary[1:])
+        self.cell_start = np.flatnonzero(boundary)
+        self.cell_keys = self.entry_keys[self.cell_start]
+        self.cell_count = np.diff(np.append(self.cell_start, len(self.entry_keys)))
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        # every pair of entities sharing at least one cell, reported once
+        if len(self.entries) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        # pair each entry with the entries after it in the same cell
+        rank = np.arange(len(self.entries)) - np.repeat(
+            self.cell_start, self.cell_count
+        )
+        after = np.repeat(self.cell_count, self.cell_count) - rank - 1
+        first, offset = _expand(after)
+        second = first + 1 + offset
+
+        a = self.entries[first]
+        b = self.entries[second]
+
+        # a pair sharing several cells is only kept in the top left shared cell
+        owner_cell = np.maximum(self.y0[a], self.y0[b]) * self.cols + np.maximum(
+            self.x0[a], self.x0[b]
+        )
+        keep = self.entry_keys[first] == owner_cell
+
+        return self.indices[a[keep]], self.indices[b[keep]]
+
+
+# NOTE: a GridIndex kept up to date between builds instead of rebuilt. It is
+# indexed by slot, indices is every slot and x0..y1 are per slot, and the
+# entries are sorted by (cell, slot). A build compares every entity's cell
+# range with the stored one and only moves entities whose range changed and
+# the ones that joined or left, entities that stay in their cells cost a few
+# comparisons. The origin and size are fixed with some padding, an entity
+# leaving them or a slot beyond the capacity rebuilds everything.
+class IncrementalGrid(GridIndex):
+    # cells of room around the entities of a full build
+    PADDING = 2
+
+    def clear(self):
+        super().clear()
+        self.capacity: int = 0
+        self.member: np.ndarray = np.zeros(0, dtype=np.bool_)
+        # entries as cell key * capacity + slot, sorted
+        self._order: np.ndarray = np.empty(0, dtype=np.int64)
+        # pair keys of everything sharing a cell, sorted, and pairs() of them
+        self._pair_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self._pairs: Optional[tuple[np.ndarray, np.ndarray]] = None
+        # full builds so far and entities moved by the last build
+        self.rebuilds: int = 0
+        self.moved: int = 0
+
+    def build(
+        self,
+        indices: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+    ):
+        if len(indices) == 0:
+            rebuilds = self.rebuilds
+            self.clear()
+            self.rebuilds = rebuilds
+            return
+
+        x0, y0, x1, y1 = cell_ranges(px, py, radius, self.cell_size_x, self.cell_size_y)
+        x0 -= self.origin_x
+        x1 -= self.origin_x
+        y0 -= self.origin_y
+        y1 -= self.origin_y
+        if (
+            int(indices.max()) >= self.capacity
+            or int(x0.min()) < 0
+            or int(y0.min()) < 0
+            or int(x1.max()) >= self.cols
+            or int(y1.max()) >= self.rows
+        ):
+            self._rebuild(indices, x0, y0, x1, y1)
+            return
+
+        member = np.zeros(self.capacity, dtype=np.bool_)
+        member[indices] = True
+        left = np.flatnonzero(self.member & ~member)
+        moved = (
+            ~self.member[indices]
+            | (self.x0[indices] != x0)
+            | (self.y0[indices] != y0)
+            | (self.x1[indices] != x1)
+            | (self.y1[indices] != y1)
+        )
+        self.moved = int(moved.sum())
+        if self.moved == 0 and len(left) == 0:
+            return
+
+        # drop the old entries and pairs of everything that moved or left
+        stale = np.zeros(self.capacity, dtype=np.bool_)
+        stale[left] = True
+        stale[indices[moved]] = True
+        kept_entries = self._order[~stale[self._order % self.capacity]]
+        lo, hi = unpack_pair_keys(self._pair_keys)
+        kept_pairs = self._pair_keys[~(stale[lo] | stale[hi])]
+
+        entering = indices[moved]
+        self.member = member
+        self.x0[entering] = x0[moved]
+        self.y0[entering] = y0[moved]
+        self.x1[entering] = x1[moved]
+        self.y1[entering] = y1[moved]
+        self._order = _merge_sorted(kept_entries, self._entries(entering))
+        self._index_order()
+
+        # pairs of the moved entities, against everything in their cells
+        query, other = _query_ranges(
+            self,
+            self.x0[entering],
+            self.y0[entering],
+            self.x1[entering],
+            self.y1[entering],
+        )
+        slot = entering[query]
+        # a pair of two moved entities is found from both sides
+        found = (slot != other) & (~stale[other] | (slot < other))
+        self._pair_keys = _merge_sorted(
+            kept_pairs, np.sort(pair_keys(slot[found], other[found]))
+        )
+        self._pairs = None
+
+    def _rebuild(
+        self,
+        indices: np.ndarray,
+        x0: np.ndarray,
+        y0: np.ndarray,
+        x1: np.ndarray,
+        y1: np.ndarray,
+    ):
+        # new origin, size and capacity around the current entities
+        # the ranges are relative to the old origin
+        capacity = max(2 * self.capacity, int(indices.max()) + 1)
+        origin_x = self.origin_x
+        origin_y = self.origin_y
+        rebuilds = self.rebuilds
+        self.clear()
+        self.rebuilds = rebuilds + 1
+        self.moved = len(indices)
+
+        shift_x = int(x0.min()) - self.PADDING
+        shift_y = int(y0.min()) - self.PADDING
+        self.origin_x = origin_x + shift_x
+        self.origin_y = origin_y + shift_y
+        self.cols = int(x1.max()) - shift_x + 1 + self.PADDING
+        self.rows = int(y1.max()) - shift_y + 1 + self.PADDING
+
+        self.capacity = capacity
+        self.indices = np.arange(capacity, dtype=np.int64)
+        self.member = np.zeros(capacity, dtype=np.bool_)
+        self.member[indices] = True
+        for name, column, shift in (
+            ("x0", x0, shift_x),
+            ("y0", y0, shift_y),
+            ("x1", x1, shift_x),
+            ("y1", y1, shift_y),
+        ):
+            cells = np.zeros(capacity, dtype=np.int64)
+            cells[indices] = column - shift
+            setattr(self, name, cells)
+        self._order = self._entries(indices)
+        self._index_order()
+        self._pair_keys = np.sort(pair_keys(*super().pairs()))
+        self._pairs = None
+
+    def _entries(self, slots: np.ndarray) -> np.ndarray:
+        # sorted entries of the given slots, as in _order
+        owner, keys = _cover(
+            self.x0[slots], self.y0[slots], self.x1[slots], self.y1[slots], self.cols
+        )
+        return np.sort(keys * self.capacity + slots[owner])
+
+    def _index_order(self):
+        self.entry_keys, self.entries = np.divmod(self._order, self.capacity)
+        self._index_cells()
+
+    def pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        # (lower, higher) slot sorted by pair, the same however the grid got
+        # here
+        if self._pairs is None:
+            self._pairs = unpack_pair_keys(self._pair_keys)
+        return self._pairs
+
+
+def _merge_sorted(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # both sorted, b usually much shorter
+    return np.insert(a, np.searchsorted(a, b), b)
+
+
+class Contacts:
+    def __init__(
+        self,
+        a: np.ndarray,
+        b: np.ndarray,
+        nx: np.ndarray,
+        ny: np.ndarray,
+        depth: np.ndarray,
+        toi: Optional[np.ndarray] = None,
+    ):
+        # slot indices of both sides of every contact
+        self.a = a
+        self.b = b
+        # unit normal pointing from a to b and penetration depth
+        self.nx = nx
+        self.ny = ny
+        self.depth = depth
+        # time of impact as a fraction of the last step, overlaps found at
+        # the end of the step have 1
+        self.toi = np.ones(len(a), dtype=np.float32) if toi is None else toi
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    @staticmethod
+    def empty() -> "Contacts":
+        index = np.empty(0, dtype=np.int64)
+        value = np.empty(0, dtype=np.float32)
+        return Contacts(index, index, value, value, value, value)
+
+    def select(self, keep: np.ndarray) -> "Contacts":
+        return Contacts(
+            self.a[keep],
+            self.b[keep],
+            self.nx[keep],
+            self.ny[keep],
+            self.depth[keep],
+            self.toi[keep],
+        )
+
+    @staticmethod
+    def concatenate(parts: list["Contacts"]) -> "Contacts":
+        return Contacts(
+            *(
+                np.concatenate([getattr(part, name) for part in parts])
+                for name in ("a", "b", "nx", "ny", "depth", "toi")
+            )
+        )
+
+
+def filter_layers(
+    a: np.ndarray, b: np.ndarray, layer: np.ndarray, mask: np.ndarray
+) -> np.ndarray:
+    # both entities have to accept each other's layer
+    return ((layer[a] & mask[b]) != 0) & ((layer[b] & mask[a]) != 0)
+
+
+def narrow_phase(
+    a: np.ndarray,
+    b: np.ndarray,
+    layer: np.ndarray,
+    mask: np.ndarray,
+    px: np.ndarray,
+    py: np.ndarray,
+    radius: np.ndarray,
+) -> Contacts:
+    # cull by layer first, it is much cheaper than the distance test
+    keep = filter_layers(a, b, layer, mask)
+    a = a[keep]
+    b = b[keep]
+
+    dx = px[b] - px[a]
+    dy = py[b] - py[a]
+    reach = radius[a] + radius[b]
+    dist2 = dx * dx + dy * dy
+    hit = dist2 <= reach * reach
+
+    a = a[hit]
+    b = b[hit]
+    dx = dx[hit]
+    dy = dy[hit]
+    dist = np.sqrt(dist2[hit])
+    depth = reach[hit] - dist
+
+    # coincident centers get an arbitrary normal
+    safe = dist > 0
+    inv = np.divide(1, dist, out=np.zeros_like(dist), where=safe)
+    nx = np.where(safe, dx * inv, 1).astype(np.float32)
+    ny = (dy * inv).astype(np.float32)
+    return Contacts(a, b, nx, ny, depth.astype(np.float32))
+
+
+def query_cells(
+    grid: GridIndex, qx: np.ndarray, qy: np.ndarray, radius: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # (query, entity) pairs for every entity sharing a cell with the bounding
+    # box of a query circle, entity is a position in grid.indices
+    empty = np.empty(0, dtype=np.int64)
+    if len(grid.entries) == 0 or len(qx) == 0:
+        return empty, empty
+
+    x0, y0, x1, y1 = cell_ranges(qx, qy, radius, grid.cell_size_x, grid.cell_size_y)
+    return _query_ranges(
+        grid,
+        x0 - grid.origin_x,
+        y0 - grid.origin_y,
+        x1 - grid.origin_x,
+        y1 - grid.origin_y,
+    )
+
+
+def _query_ranges(
+    grid: GridIndex, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # query_cells for cell ranges relative to the grid origin
+    x0 = np.maximum(x0, 0)
+    y0 = np.maximum(y0, 0)
+    x1 = np.minimum(x1, grid.cols - 1)
+    y1 = np.minimum(y1, grid.rows - 1)
+    width = np.maximum(x1 - x0 + 1, 0)
+    height = np.maximum(y1 - y0 + 1, 0)
+
+    # every (query, cell) pair and the occupied cell it maps to
+    query, local = _expand(width * height)
+    cx = x0[query] + local % width[query]
+    cy = y0[query] + local // width[query]
+    keys = cy * grid.cols + cx
+    cell = np.searchsorted(grid.cell_keys, keys)
+    cell = np.minimum(cell, len(grid.cell_keys) - 1)
+    count = np.where(grid.cell_keys[cell] == keys, grid.cell_count[cell], 0)
+
+    # every entry of those cells
+    owner, local = _expand(count)
+    position = grid.cell_start[cell[owner]] + local
+    query = query[owner]
+    entity = grid.entries[position]
+
+    # an entity sharing several cells with a query is only kept once
+    owner_cell = np.maximum(y0[query], grid.y0[entity]) * grid.cols + np.maximum(
+        x0[query], grid.x0[entity]
+    )
+    keep = grid.entry_keys[position] == owner_cell
+    return query[keep], entity[keep]
+
+
+def query_box(
+    grid: GridIndex, x0: float, y0: float, x1: float, y1: float
+) -> np.ndarray:
+    # positions in grid.indices of every entity in a cell overlapping the box,
+    # each one once
+    if len(grid.entries) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    cx0, cy0, cx1, cy1 = (
+        int(np.floor(value / size)) - origin
+        for value, size, origin in (
+            (x0, grid.cell_size_x, grid.origin_x),
+            (y0, grid.cell_size_y, grid.origin_y),
+            (x1, grid.cell_size_x, grid.origin_x),
+            (y1, grid.cell_size_y, grid.origin_y),
+        )
+    )
+    cx = grid.cell_keys % grid.cols
+    cy = grid.cell_keys // grid.cols
+    cells = np.flatnonzero((cx >= cx0) & (cx <= cx1) & (cy >= cy0) & (cy <= cy1))
+
+    owner, local = _expand(grid.cell_count[cells])
+    entity = grid.entries[grid.cell_start[cells][owner] + local]
+    return np.unique(entity)
+
+
+def query_radius(
+    grid: GridIndex,
+    qx: np.ndarray,
+    qy: np.ndarray,
+    radius: np.ndarray,
+    px: np.ndarray,
+    py: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (query, slot index, squared distance) for every entity whose center is
+    # within radius of a query point, px/py are indexed by slot
+    radius = np.broadcast_to(radius, qx.shape)
+    query, entity = query_cells(grid, qx, qy, radius)
+    index = grid.indices[entity]
+    dx = px[index] - qx[query]
+    dy = py[index] - qy[query]
+    dist2 = dx * dx + dy * dy
+    inside = dist2 <= radius[query] * radius[query]
+    return query[inside], index[inside], dist2[inside]
+
+
+def k_nearest(
+    count: int,
+    query: np.ndarray,
+    index: np.ndarray,
+    dist2: np.ndarray,
+    k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # reduce query_radius results to the k closest per query, (count, k)
+    # arrays padded with -1 / inf
+    nearest = np.full((count, k), -1, dtype=np.int64)
+    # same dtype as dist2, the k == 1 path compares against it exactly
+    nearest_dist2 = np.full((count, k), np.inf, dtype=dist2.dtype)
+    if len(query) == 0:
+        return nearest, nearest_dist2
+
+    if k == 1:
+        # no sort needed for the closest one
+        np.minimum.at(nearest_dist2[:, 0], query, dist2)
+        closest = dist2 == nearest_dist2[query, 0]
+        nearest[query[closest], 0] = index[closest]
+        return nearest, nearest_dist2
+
+    order = np.lexsort((dist2, query))
+    query = query[order]
+    starts = np.searchsorted(query, query, side="left")
+    rank = np.arange(len(query)) - starts
+    keep = rank < k
+    nearest[query[keep], rank[keep]] = index[order][keep]
+    nearest_dist2[query[keep], rank[keep]] = dist2[order][keep]
+    return nearest, nearest_dist2
+
+
+def _wrap(offset: np.ndarray, period: Optional[float]) -> np.ndarray:
+    # shortest offset when positions wrap around at period
+    if period is None:
+        return offset
+    return offset - period * np.round(offset / period)
+
+
+def _periodic_images(
+    px: np.ndarray,
+    py: np.ndarray,
+    margin: float,
+    width: Optional[float],
+    height: Optional[float],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (owner, x, y) of every point and of its copies shifted by the world
+    # size that end up within margin of the world
+    owner = np.arange(len(px), dtype=np.int64)
+    if width is None or height is None:
+        return owner, px, py
+
+    owners, xs, ys = [owner], [px], [py]
+    reach_x = int(np.ceil(margin / width))
+    reach_y = int(np.ceil(margin / height))
+    for shift_x in range(-reach_x, reach_x + 1):
+        for shift_y in range(-reach_y, reach_y + 1):
+            if shift_x == 0 and shift_y == 0:
+                continue
+            x = px + shift_x * width
+            y = py + shift_y * height
+            keep = (
+                (x >= -margin)
+                & (x <= width + margin)
+                & (y >= -margin)
+                & (y <= height + margin)
+            )
+            owners.append(owner[keep])
+            xs.append(x[keep])
+            ys.append(y[keep])
+    return np.concatenate(owners), np.concatenate(xs), np.concatenate(ys)
+
+
+# NOTE: Verlet style neighbour lists. Every entity keeps the entities within
+# its radius plus a skin margin at the time of the last build. Until some
+# entity has moved more than half the skin, or a radius grew, every pair
+# within radius is guaranteed to be in the lists, so a query only has to
+# check the cached pairs against their current distance instead of going
+# through a grid. The lists are sorted by (query, neighbour), results don't
+# depend on when the last build happened.
+# The lists are kept by slot, so entities that left since the build are just
+# skipped by queries, only an entity the lists don't know yet forces a build.
+# With a limit only the `limit` nearest within radius count. The current
+# nearest can't be further away at the build than the limit-th nearest was
+# plus twice the skin, so the lists only keep pairs up to that distance and
+# still give the exact nearest, no matter how crowded it gets. The lists go
+# `spare` nearest further than the limit, so a few entities can leave a list
+# before it is short of the limit within that distance and has to be built
+# again.
+# Given a width and height positions wrap around at the world size and the
+# shortest offset between two entities counts.
+class NeighbourList:
+    def __init__(self, skin: float, limit: Optional[int] = None, spare: int = 2):
+        self.skin = skin
+        self.limit = limit
+        # nearest kept past the limit, that many can die before a list is short
+        self.spare = spare
+        # builds since creation
+        self.rebuilds = 0
+        self.clear()
+
+    def clear(self):
+        # slot indices, positions and radii the lists were built for, order
+        # sorts indices
+        self.indices: np.ndarray = np.empty(0, dtype=np.int64)
+        self.order: np.ndarray = np.empty(0, dtype=np.int64)
+        self.px: np.ndarray = np.empty(0, dtype=np.float32)
+        self.py: np.ndarray = np.empty(0, dtype=np.float32)
+        self.radius: np.ndarray = np.empty(0, dtype=np.float32)
+
+        # (query, neighbour) pairs as positions in indices, every query owns
+        # the pairs starts[i]:starts[i] + counts[i]
+        self.query: np.ndarray = np.empty(0, dtype=np.int64)
+        self.neighbour: np.ndarray = np.empty(0, dtype=np.int64)
+        self.counts: np.ndarray = np.empty(0, dtype=np.int64)
+        self.starts: np.ndarray = np.empty(0, dtype=np.int64)
+        # distance up to which every query's list was complete at the build
+        self.cover: np.ndarray = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.query)
+
+    def positions(self, indices: np.ndarray) -> np.ndarray:
+        # position of every slot of indices in the lists, -1 if not in them
+        if np.array_equal(indices, self.indices):
+            return np.arange(len(indices), dtype=np.int64)
+        if len(self.indices) == 0:
+            return np.full(len(indices), -1, dtype=np.int64)
+        where = np.searchsorted(self.indices, indices, sorter=self.order)
+        position = self.order[np.minimum(where, len(self.indices) - 1)]
+        return np.where(self.indices[position] == indices, position, -1)
+
+    def valid(
+        self,
+        indices: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+    ) -> bool:
+        return self._valid(self.positions(indices), px, py, radius, width, height)
+
+    def _valid(
+        self,
+        position: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float],
+        height: Optional[float],
+    ) -> bool:
+        if len(position) == 0:
+            return True
+        # a new entity, or a slot reused by one, is in nobody's list yet
+        if (position < 0).any():
+            return False
+        if (radius > self.radius[position]).any():
+            return False
+        moved_x = _wrap(px - self.px[position], width)
+        moved_y = _wrap(py - self.py[position], height)
+        moved2 = moved_x * moved_x + moved_y * moved_y
+        return float(moved2.max()) <= (self.skin / 2) ** 2
+
+    def build(
+        self,
+        indices: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+    ):
+        self.clear()
+        self.rebuilds += 1
+        count = len(indices)
+        self.indices = indices.copy()
+        self.order = np.argsort(indices)
+        self.px = px.copy()
+        self.py = py.copy()
+        self.radius = radius.copy()
+        self.counts = np.zeros(count, dtype=np.int64)
+        self.starts = np.zeros(count, dtype=np.int64)
+        self.cover = np.zeros(count, dtype=np.float32)
+        if count == 0:
+            return
+
+        reach = (radius + self.skin).astype(np.float32)
+        search = reach.copy()
+        if self.limit is not None:
+            # first guess from the average spacing, grown where it was short
+            area = (width or float(np.ptp(px)) + 1) * (height or float(np.ptp(py)) + 1)
+            spacing = np.sqrt((self.limit + self.spare) * area / (np.pi * count))
+            np.minimum(search, 1.5 * spacing + 2 * self.skin, out=search)
+
+        # points in a grid with cells about as big as the first search, so
+        # every query only touches a few cells
+        cell_size = max(float(search.max()), 1)
+        grid = GridIndex(cell_size, cell_size)
+        margin = -1.0
+
+        parts = []
+        pending = np.arange(count, dtype=np.int64)
+        while len(pending) > 0:
+            # copies across the world edges as far as the searches go
+            if float(search[pending].max()) > margin:
+                margin = float(search[pending].max())
+                owner, image_x, image_y = _periodic_images(
+                    px, py, margin, width, height
+                )
+                grid.build(
+                    owner, image_x, image_y, np.zeros(len(owner), dtype=np.float32)
+                )
+
+            query, entity = query_cells(grid, px[pending], py[pending], search[pending])
+            query = pending[query]
+            dx = image_x[entity] - px[query]
+            dy = image_y[entity] - py[query]
+            dist2 = dx * dx + dy * dy
+            entity = owner[entity]
+            inside = (entity != query) & (dist2 <= search[query] ** 2)
+            query = query[inside]
+            entity = entity[inside]
+            dist = np.sqrt(dist2[inside])
+
+            # sort by (query, entity), an entity seen through several images
+            # counts with the closest one
+            key = query * count + entity
+            order = np.argsort(key)
+            key = key[order]
+            first = np.flatnonzero(np.diff(key, prepend=-1))
+            dist = np.minimum.reduceat(dist[order], first) if len(key) else dist
+            query, entity = np.divmod(key[first], count)
+
+            # a search is done once it covers the reach or the limit-th
+            # nearest plus twice the skin
+            kth = np.full(count, np.inf, dtype=np.float32)
+            if self.limit is not None:
+                found = np.bincount(query, minlength=count)
+                kth = _kth_smallest(dist, found, self.limit + self.spare)
+            done = (search >= reach) | (kth + 2 * self.skin <= search)
+
+            keep = done[query] & (dist <= kth[query] + 2 * self.skin)
+            parts.append((query[keep], entity[keep]))
+            finished = pending[done[pending]]
+            self.cover[finished] = np.minimum(
+                search[finished], kth[finished] + 2 * self.skin
+            )
+            pending = pending[~done[pending]]
+            search[pending] = np.minimum(reach[pending], search[pending] * 2)
+
+        # pairs are unique, a plain sort of their keys orders them
+        key = np.sort(
+            np.concatenate([query * count + entity for query, entity in parts])
+        )
+        self.query, self.neighbour = np.divmod(key, count)
+        self.counts = np.bincount(self.query, minlength=count)
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def query_radius(
+        self,
+        indices: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float] = None,
+        height: Optional[float] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # (neighbour, dx, dy, counts) of every other entity within radius of
+        # each entity, grouped by entity with counts[i] neighbours for entity
+        # i. Neighbours are positions in indices, dx and dy the offset to them
+        # and px, py and radius are per entity of indices. Rebuilds the lists
+        # when needed.
+        position = self.positions(indices)
+        if not self._valid(position, px, py, radius, width, height):
+            self.build(indices, px, py, radius, width, height)
+            position = self.positions(indices)
+        result = self._query(position, px, py, radius, width, height)
+        if result is None:
+            self.build(indices, px, py, radius, width, height)
+            result = self._query(self.positions(indices), px, py, radius, width, height)
+        return result
+
+    def _query(
+        self,
+        position: np.ndarray,
+        px: np.ndarray,
+        py: np.ndarray,
+        radius: np.ndarray,
+        width: Optional[float],
+        height: Optional[float],
+    ) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        # None when entities that left may hide a nearer one behind the limit
+        if np.array_equal(position, np.arange(len(self.indices))):
+            # the entities of the build in their order, every pair is current
+            neighbour = self.neighbour
+            counts = self.counts
+        else:
+            # pairs of every entity in the order of indices, neighbours moved
+            # to their position in indices and the ones that left dropped
+            counts = self.counts[position]
+            owner, local = _expand(counts)
+            current = np.full(len(self.indices), -1, dtype=np.int64)
+            current[position] = np.arange(len(position))
+            neighbour = current[self.neighbour[self.starts[position][owner] + local]]
+            present = neighbour >= 0
+            owner = owner[present]
+            neighbour = neighbour[present]
+            counts = segment_sum(present.astype(np.int64), counts)
+            if not (np.diff(position) > 0).all():
+                # sorted by neighbour like a fresh build, sums depend on it
+                key = np.sort(owner * len(position) + neighbour)
+                neighbour = key % len(position)
+
+        # the lists are sorted by query, repeating beats gathering
+        dx = _wrap(px[neighbour] - np.repeat(px, counts), width)
+        dy = _wrap(py[neighbour] - np.repeat(py, counts), height)
+        dist2 = dx * dx + dy * dy
+        inside = dist2 <= np.repeat(radius * radius, counts)
+
+        if self.limit is not None:
+            # moved by up to half the skin each, every list is still complete
+            # up to its cover minus the skin, past that the limit-th nearest
+            # has to be found within it
+            complete = self.cover[position] - self.skin
+            short = radius > complete
+            if short.any():
+                found = segment_sum(
+                    (dist2 <= np.repeat(complete * complete, counts)).astype(np.int64),
+                    counts,
+                )
+                if (short & (found < self.limit)).any():
+                    return None
+            # ties with the limit-th nearest are kept as well
+            kth = _kth_smallest(np.where(inside, dist2, np.inf), counts, self.limit)
+            inside &= dist2 <= np.repeat(kth, counts)
+        counts = segment_sum(inside.astype(np.int64), counts)
+        return neighbour[inside], dx[inside], dy[inside], counts
+
+
+def segment_sum(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # sum of every segment, values holds the segments back to back with
+    # counts[i] values each
+    result = np.zeros(len(counts), dtype=values.dtype)
+    # reduceat gives an empty segment the value at its start and can't start
+    # past the end, so only the non empty ones are reduced
+    filled = counts > 0
+    if filled.any():
+        starts = (np.cumsum(counts) - counts)[filled]
+        result[filled] = np.add.reduceat(values, starts)
+    return result
+
+
+# NOTE: continuous collision for fast movers. Every mover sweeps its circle
+# from prev_px/prev_py to px/py while the targets sweep theirs over the same
+# step, the first time the circles touch is solved per candidate pair:
+#
+#   |m + t * v| = r_a + r_b, m = a0 - b0, v = (a1 - a0) - (b1 - b0)
+#
+# candidates come from the grid, queried with a circle bounding the swept
+# segment grown by the largest target displacement.
+def sweep_circles(
+    grid: GridIndex,
+    movers: np.ndarray,
+    px: np.ndarray,
+    py: np.ndarray,
+    prev_px: np.ndarray,
+    prev_py: np.ndarray,
+    radius: np.ndarray,
+    layer: np.ndarray,
+    mask: np.ndarray,
+) -> Contacts:
+    # all arrays but movers are indexed by slot, contacts are mover -> target
+    # with the normal at the time of impact and depth 0
+    if len(movers) == 0 or len(grid.entries) == 0:
+        return Contacts.empty()
+
+    targets = grid.indices
+    # only what is in the grid, grid.indices can hold empty slots
+    present = targets[grid.entries]
+    margin = float(
+        np.sqrt(
+            (px[present] - prev_px[present]) ** 2
+            + (py[present] - prev_py[present]) ** 2
+        ).max()
+    )
+    ax = prev_px[movers].astype(np.float64)
+    ay = prev_py[movers].astype(np.float64)
+    dx = px[movers] - ax
+    dy = py[movers] - ay
+    reach = np.sqrt(dx * dx + dy * dy) / 2 + radius[movers] + margin
+    query, entity = query_cells(grid, ax + dx / 2, ay + dy / 2, reach)
+
+    a = movers[query]
+    b = targets[entity]
+    keep = (a != b) & filter_layers(a, b, layer, mask)
+    a = a[keep]
+    b = b[keep]
+
+    mx = prev_px[a].astype(np.float64) - prev_px[b]
+    my = prev_py[a].astype(np.float64) - prev_py[b]
+    vx = (px[a] - prev_px[a]).astype(np.float64) - (px[b] - prev_px[b])
+    vy = (py[a] - prev_py[a]).astype(np.float64) - (py[b] - prev_py[b])
+    touch = radius[a].astype(np.float64) + radius[b]
+
+    # already touching at the start is an impact at 0
+    qa = vx * vx + vy * vy
+    qb = 2 * (mx * vx + my * vy)
+    qc = mx * mx + my * my - touch * touch
+    disc = qb * qb - 4 * qa * qc
+    moving = (qa > 0) & (disc >= 0)
+    toi = np.where(qc <= 0, 0, np.inf)
+    root = np.divide(
+        -qb - np.sqrt(np.maximum(disc, 0)),
+        2 * qa,
+        out=np.full_like(qa, np.inf),
+        where=moving,
+    )
+    toi = np.where((qc > 0) & (root >= 0), root, toi)
+    hit = toi <= 1
+
+    a = a[hit]
+    b = b[hit]
+    toi = toi[hit]
+    nx = mx[hit] + toi * vx[hit]
+    ny = my[hit] + toi * vy[hit]
+    # normal from mover to target
+    dist = np.sqrt(nx * nx + ny * ny)
+    safe = dist > 0
+    inv = np.divide(-1, dist, out=np.zeros_like(dist), where=safe)
+    return Contacts(
+        a,
+        b,
+        np.where(safe, nx * inv, 1).astype(np.float32),
+        (ny * inv).astype(np.float32),
+        np.zeros(len(a), dtype=np.float32),
+        toi.astype(np.float32),
+    )
+
+
+def first_hits(contacts: Contacts) -> Contacts:
+    # only the earliest contact of every `a`, ties broken by the lower `b`
+    if len(contacts) == 0:
+        return contacts
+    order = np.lexsort((contacts.b, contacts.toi, contacts.a))
+    a = contacts.a[order]
+    first = np.ones(len(a), dtype=np.bool_)
+    np.not_equal(a[1:], a[:-1], out=first[1:])
+    return contacts.select(order[first])
+
+
+# NOTE: Jacobi style contact solver, every iteration handles all contacts at
+# once: overlaps are pushed apart along the normal and approaching bodies get
+# an impulse, both split by inverse mass. A body in several contacts gets the
+# average of its corrections so crowds don't overshoot. Positions and
+# velocities are indexed by slot and updated in place.
+def resolve_contacts(
+    a: np.ndarray,
+    b: np.ndarray,
+    inv_mass_a: np.ndarray,
+    inv_mass_b: np.ndarray,
+    px: np.ndarray,
+    py: np.ndarray,
+    vx: np.ndarray,
+    vy: np.ndarray,
+    radius: np.ndarray,
+    iterations: int,
+    restitution: float,
+    slop: float = 0.01,
+):
+    if len(a) == 0:
+        return
+
+    # work on a compact copy of the bodies involved
+    bodies, local = np.unique(np.concatenate((a, b)), return_inverse=True)
+    la = local[: len(a)]
+    lb = local[len(a) :]
+    count = len(bodies)
+    contacts = np.bincount(local, minlength=count)
+    x = px[bodies].astype(np.float64)
+    y = py[bodies].astype(np.float64)
+    u = vx[bodies].astype(np.float64)
+    v = vy[bodies].astype(np.float64)
+    reach = radius[a].astype(np.float64) + radius[b]
+    wa = inv_mass_a.astype(np.float64)
+    wb = inv_mass_b.astype(np.float64)
+    weight = np.maximum(wa + wb, 1e-12)
+
+    def scatter(values: np.ndarray) -> np.ndarray:
+        # per body sum of `values` applied to b minus applied to a, averaged
+        total = np.bincount(lb, values * wb, count) - np.bincount(
+            la, values * wa, count
+        )
+        return total / contacts
+
+    for _ in range(iterations):
+        dx = x[lb] - x[la]
+        dy = y[lb] - y[la]
+        dist = np.sqrt(dx * dx + dy * dy)
+        depth = reach - dist
+        touching = depth > 0
+        # everything separated already, up to the slop
+        if not (depth > slop).any():
+            break
+
+        # coincident centers get an arbitrary normal
+        safe = dist > 0
+        inv = np.divide(1, dist, out=np.zeros_like(dist), where=safe)
+        nx = np.where(safe, dx * inv, 1)
+        ny = dy * inv
+
+        # separate
+        push = np.maximum(depth - slop, 0) / weight
+        x += scatter(nx * push)
+        y += scatter(ny * push)
+
+        # only approaching pairs get an impulse
+        approach = (u[lb] - u[la]) * nx + (v[lb] - v[la]) * ny
+        impulse = np.where(
+            touching & (approach < 0), -(1 + restitution) * approach / weight, 0
+        )
+        u += scatter(nx * impulse)
+        v += scatter(ny * impulse)
+
+    px[bodies] = x
+    py[bodies] = y
+    vx[bodies] = u
+    vy[bodies] = v
+
+
+def brute_force_pairs(
+    indices: np.ndarray,
+    px: np.ndarray,
+    py: np.ndarray,
+    radius: np.ndarray,
+    cell_size_x: float,
+    cell_size_y: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    # O(n^2) reference for GridIndex.pairs, only meant for checks
+    x0, y0, x1, y1 = cell_ranges(px, py, radius, cell_size_x, cell_size_y)
+    a, b = np.triu_indices(len(indices), k=1)
+    shared = (np.maximum(x0[a], x0[b]) <= np.minimum(x1[a], x1[b])) & (
+        np.maximum(y0[a], y0[b]) <= np.minimum(y1[a], y1[b])
+    )
+    return indices[a[shared]], indices[b[shared]]
+
+
+def pair_keys(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # order independent 64 bit key per pair of slot indices
+    lo = np.minimum(a, b).astype(np.int64)
+    hi = np.maximum(a, b).astype(np.int64)
+    return (lo << 32) | hi
+
+
+def unpack_pair_keys(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # (lower, higher) slot index of every pair key
+    return keys >> 32, keys & 0xFFFFFFFF
+
+
+def touching(parts: list[Contacts]) -> tuple[Contacts, np.ndarray]:
+    # every pair found by any of the parts once, the first part to report it
+    # wins, as (contacts, pair keys) sorted by key
+    contacts = Contacts.concatenate(parts)
+    keys, first = np.unique(pair_keys(contacts.a, contacts.b), return_index=True)
+    return contacts.select(first), keys
+
+
+# NOTE: contact events come from diffing the sorted pair keys of two ticks,
+# pairs only in the current tick entered, pairs in both stayed and pairs
+# only in the previous one exited
+def contact_events(
+    previous: np.ndarray, keys: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    # (mask of keys that entered, keys of previous that exited)
+    entered = ~np.isin(keys, previous, assume_unique=True)
+    exited = previous[~np.isin(previous, keys, assume_unique=True)]
+    return entered, exited
@@ -0,0 +1,178 @@
+import csv
+import json
+import time
+
+import numpy as np
+import pyray as rl
+
+SPAN = 0
+COUNTER = 1
+
+
+class _Section:
+    __slots__ = ("profiler", "section", "start")
+
+    def __init__(self, profiler: "Profiler", section: int):
+        self.profiler = profiler
+        self.section = section
+        self.start = 0
+
+    def __enter__(self) -> "_Section":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        end = time.perf_counter_ns()
+        self.profiler._record(SPAN, self.section, self.start, end - self.start)
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSection":
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NULL_SECTION = _NullSection()
+
+
+# NOTE: samples go into a fixed size ring buffer, when the profiler is
+# disabled section() hands out a shared no-op context and count() returns
+# right away
+class Profiler:
+    def __init__(self, capacity: int = 1 << 16, enabled: bool = False):
+        assert capacity > 0
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frame = 0
+
+        self.names: list[str] = []
+        self.kinds: list[int] = []
+        self._name_ids: dict[str, int] = {}
+
+        self._head = 0  # next sample to write
+        self._size = 0
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        self.section_id = np.zeros(capacity, dtype=np.int32)
+        self.frame_id = np.zeros(capacity, dtype=np.int64)
+        self.start_ns = np.zeros(capacity, dtype=np.int64)
+        # duration in ns for spans, the value for counters
+        self.value = np.zeros(capacity, dtype=np.int64)
+
+    def _id(self, name: str, kind: int) -> int:
+        section = self._name_ids.get(name)
+        if section is None:
+            section = len(self.names)
+            self._name_ids[name] = section
+            self.names.append(name)
+            self.kinds.append(kind)
+        return section
+
+    def is_span(self, name: str) -> bool:
+        return self.kinds[self._name_ids[name]] == SPAN
+
+    def _record(self, kind: int, section: int, start: int, value: int):
+        head = self._head
+        self.kind[head] = kind
+        self.section_id[head] = section
+        self.frame_id[head] = self.frame
+        self.start_ns[head] = start
+        self.value[head] = value
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def section(self, name: str) -> _Section | _NullSection:
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, self._id(name, SPAN))
+
+    def span(self, name: str, start_ns: int, duration_ns: int):
+        # for timings taken elsewhere, e.g. on another thread
+        if not self.enabled:
+            return
+        self._record(SPAN, self._id(name, SPAN), start_ns, duration_ns)
+
+    def count(self, name: str, value: int):
+        if not self.enabled:
+            return
+        self._record(COUNTER, self._id(name, COUNTER), time.perf_counter_ns(), value)
+
+    def next_frame(self):
+        self.frame += 1
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def samples(self) -> np.ndarray:
+        # positions of the stored samples, oldest first
+        start = (self._head - self._size) % self.capacity
+        return (start + np.arange(self._size)) % self.capacity
+
+    def averages(self, frames: int = 60) -> dict[str, float]:
+        # mean value per frame over the last `frames` frames, spans in ms
+        order = self.samples()
+        recent = order[self.frame_id[order] > self.frame - frames]
+        if len(recent) == 0:
+            return {}
+
+        sections = self.section_id[recent]
+        totals = np.bincount(sections, self.value[recent], len(self.names))
+        seen = len(np.unique(self.frame_id[recent]))
+
+        averages = {}
+        for section in np.unique(sections).tolist():
+            average = totals[section] / seen
+            if self.kinds[section] == SPAN:
+                average /= 1e6
+            averages[self.names[section]] = average
+        return averages
+
+    def export_chrome_trace(self, path: str):
+        # open with chrome://tracing or https://ui.perfetto.dev
+        order = self.samples()
+        events = []
+        for i in order.tolist():
+            name = self.names[self.section_id[i]]
+            ts = self.start_ns[i] / 1e3
+            if self.kind[i] == SPAN:
+                dur = self.value[i] / 1e3
+                events.append(
+                    {"name": name, "ph": "X", "ts": ts, "dur": dur, "pid": 0, "tid": 0}
+                )
+            else:
+                value = int(self.value[i])
+                events.append(
+                    {"name": name, "ph": "C", "ts": ts, "pid": 0, "args": {name: value}}
+                )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path: str):
+        order = self.samples()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "name", "kind", "start_ns", "value"])
+            for i in order.tolist():
+                writer.writerow(
+                    [
+                        int(self.frame_id[i]),
+                        self.names[self.section_id[i]],
+                        "span" if self.kind[i] == SPAN else "counter",
+                        int(self.start_ns[i]),
+                        int(self.value[i]),
+                    ]
+                )
+
+
+def draw_overlay(profiler: Profiler, x: int, y: int, font_size: int = 10):
+    for name, average in profiler.averages().items():
+        if profiler.is_span(name):
+            text = f"{name}: {average:.2f} ms"
+        else:
+            text = f"{name}: {average:.0f}"
+        rl.draw_text(text, x, y, font_size, rl.GREEN)
+        y += font_size + 2
@@ -0,0 +1,274 @@
+import argparse
+import json
+import sys
+import time
+import zlib
+
+import numpy as np
+import pyray as rl
+
+import main
+
+# python replay.py session.npz [--output results.json]
+
+# NOTE: a recording is everything the platform told the simulation, one
+# sample per tick: for every input key a pressed and a down bit. Together
+# with the world's seed and setup arguments that's enough to run the exact
+# same session again.
+# Checksums of the world state every CHECKSUM_INTERVAL ticks tell if a
+# revision still simulates the same thing.
+
+CHECKSUM_INTERVAL = 60
+
+
+def checksum(world: main.World) -> int:
+    crc = zlib.crc32(np.float64(world.time).tobytes())
+    for column in world.slots.arrays().values():
+        crc = zlib.crc32(np.ascontiguousarray(column).data, crc)
+    for name in world.GROUPS:
+        group: main.DenseSet = getattr(world, name)
+        crc = zlib.crc32(np.ascontiguousarray(group.indices).data, crc)
+    return crc
+
+
+class Recording:
+    def __init__(
+        self,
+        seed: int,
+        dt: float,
+        enemies: int,
+        max_entities: int,
+        width: int,
+        height: int,
+        start_time: float,
+        keys: list[int],
+        storage: str = "default",
+    ):
+        self.seed = seed
+        self.dt = dt
+        self.enemies = enemies
+        self.max_entities = max_entities
+        self.width = width
+        self.height = height
+        self.start_time = start_time
+        self.keys = keys
+        # slot dtypes change the results, see main.STORAGE_PROFILES
+        self.storage = storage
+
+        # per tick samples
+        self.buttons: list[int] = []
+        # tick -> world checksum after that tick
+        self.checksums: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.buttons)
+
+    def sample(self, platform: main.Platform):
+        buttons = 0
+        for bit, key in enumerate(self.keys):
+            buttons |= platform.is_key_pressed(key) << (2 * bit)
+            buttons |= platform.is_key_down(key) << (2 * bit + 1)
+        self.buttons.append(buttons)
+
+    def checkpoint(self, world: main.World):
+        # called after every tick, only hashes every CHECKSUM_INTERVAL ticks
+        if len(self) % CHECKSUM_INTERVAL == 0:
+            self.checksums[len(self)] = checksum(world)
+
+    def create_world(self) -> main.World:
+        return main.create_world(
+            self.enemies,
+            self.max_entities,
+            self.width,
+            self.height,
+            ReplayPlatform(self),
+            self.seed,
+            storage=self.storage,
+        )
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            setup=np.array(
+                json.dumps(
+                    {
+                        "seed": self.seed,
+                        "dt": self.dt,
+                        "enemies": self.enemies,
+                        "max_entities": self.max_entities,
+                        "width": self.width,
+                        "height": self.height,
+                        "start_time": self.start_time,
+                        "keys": self.keys,
+                        "storage": self.storage,
+                    }
+                )
+            ),
+            buttons=np.array(self.buttons, dtype=np.uint16),
+            checksum_ticks=np.array(list(self.checksums), dtype=np.int64),
+            checksums=np.array(list(self.checksums.values()), dtype=np.uint32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with np.load(path) as data:
+            recording = cls(**json.loads(str(data["setup"])))
+            recording.buttons = data["buttons"].tolist()
+            recording.checksums = dict(
+                zip(data["checksum_ticks"].tolist(), data["checksums"].tolist())
+            )
+        return recording
+
+
+# NOTE: answers with what the wrapped platform said at the start of the tick
+# and records it, so the simulation only ever sees recorded values
+class RecordingPlatform(main.Platform):
+    def __init__(self, platform: main.Platform, recording: Recording):
+        self.platform = platform
+        self.recording = recording
+
+    def advance(self, dt: float):
+        self.platform.advance(dt)
+        self.recording.sample(self.platform)
+
+    def _buttons(self) -> int:
+        return self.recording.buttons[-1] if self.recording.buttons else 0
+
+    def get_time(self) -> float:
+        return self.platform.get_time()
+
+    def get_fps(self) -> float:
+        return self.platform.get_fps()
+
+    def get_screen_width(self) -> int:
+        return self.platform.get_screen_width()
+
+    def get_screen_height(self) -> int:
+        return self.platform.get_screen_height()
+
+    def is_key_pressed(self, key: rl.KeyboardKey) -> bool:
+        bit = self.recording.keys.index(key)
+        return bool(self._buttons() >> (2 * bit) & 1)
+
+    def is_key_down(self, key: rl.KeyboardKey) -> bool:
+        bit = self.recording.keys.index(key)
+        return bool(self._buttons() >> (2 * bit + 1) & 1)
+
+
+# NOTE: plays a recording back tick by tick, the clock runs at the recorded
+# dt from the recorded start time
+class ReplayPlatform(main.Platform):
+    def __init__(self, recording: Recording):
+        self.recording = recording
+        self.tick = 0
+
+    def advance(self, dt: float):
+        assert self.tick < len(self.recording), "replayed past the recording"
+        self.tick += 1
+
+    def get_time(self) -> float:
+        return self.recording.start_time + self.tick * self.recording.dt
+
+    def get_fps(self) -> float:
+        return 1 / self.recording.dt
+
+    # the simulation only knows the world size, the screen doesn't matter
+    def get_screen_width(self) -> int:
+        return self.recording.width
+
+    def get_screen_height(self) -> int:
+        return self.recording.height
+
+    def is_key_pressed(self, key: rl.KeyboardKey) -> bool:
+        bit = self.recording.keys.index(key)
+        return bool(self.recording.buttons[self.tick - 1] >> (2 * bit) & 1)
+
+    def is_key_down(self, key: rl.KeyboardKey) -> bool:
+        bit = self.recording.keys.index(key)
+        return bool(self.recording.buttons[self.tick - 1] >> (2 * bit + 1) & 1)
+
+
+def record(
+    world: main.World,
+    enemies: int,
+    max_entities: int,
+    width: int,
+    height: int,
+    dt: float,
+    storage: str = "default",
+) -> Recording:
+    # call right after main.create_world, before the first tick
+    recording = Recording(
+        world.seed,
+        dt,
+        enemies,
+        max_entities,
+        width,
+        height,
+        world.time,
+        [int(key.key) for key in world.inputs.keys()],
+        storage,
+    )
+    world.platform = RecordingPlatform(world.platform, recording)
+    return recording
+
+
+def replay(recording: Recording) -> dict:
+    world = recording.create_world()
+    ticks = len(recording)
+    tick_times = np.empty(ticks)
+    mismatches = []
+    for tick in range(1, ticks + 1):
+        start = time.perf_counter()
+        world.platform.advance(recording.dt)
+        main.step(world, recording.dt)
+        tick_times[tick - 1] = time.perf_counter() - start
+
+        expected = recording.checksums.get(tick)
+        if expected is not None and checksum(world) != expected:
+            mismatches.append(tick)
+
+    return {
+        "ticks": ticks,
+        "ticks_per_sec": ticks / tick_times.sum(),
+        "tick_ms": {
+            "mean": tick_times.mean() * 1e3,
+            "p50": np.percentile(tick_times, 50) * 1e3,
+            "p95": np.percentile(tick_times, 95) * 1e3,
+            "p99": np.percentile(tick_times, 99) * 1e3,
+            "max": tick_times.max() * 1e3,
+        },
+        "checksums": len(recording.checksums),
+        "mismatches": mismatches,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="replay a recorded session")
+    parser.add_argument("recording")
+    parser.add_argument("--output", help="write results as json")
+    args = parser.parse_args()
+
+    result = replay(Recording.load(args.recording))
+    tick_ms = result["tick_ms"]
+    print(
+        f"{result['ticks']} ticks ({result['ticks_per_sec']:.1f} ticks/s)"
+        f" tick ms mean {tick_ms['mean']:.3f} p50 {tick_ms['p50']:.3f}"
+        f" p95 {tick_ms['p95']:.3f} p99 {tick_ms['p99']:.3f}"
+        f" max {tick_ms['max']:.3f}"
+    )
+    mismatches = result["mismatches"]
+    matched = result["checksums"] - len(mismatches)
+    print(f"checksums: {matched}/{result['checksums']} match")
+    if mismatches:
+        print(f"first mismatch after tick {mismatches[0]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,346 @@
+import math
+import types
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+import main
+import physics
+
+# NOTE: optional multi process mode. The world is cut into vertical strips,
+# every strip (shard) is simulated by its own worker process. All slot
+# columns live in shared memory so workers and the renderer use the same
+# arrays without copies. Membership, spawning and destruction stay in the
+# main process. A worker keeps the grid of its last collision pass, sweeps
+# and spatial queries of the main process are answered from those grids, so
+# the broadphase runs once per tick and only in the workers.
+
+
+class SharedArrays:
+    # main.Allocator backed by one shared memory block per column
+    def __init__(self):
+        self.blocks: dict[str, SharedMemory] = {}
+        # name -> (shared memory name, shape, dtype) for workers to attach
+        self.specs: dict[str, tuple[str, tuple[int, ...], str]] = {}
+
+    def __call__(self, name: str, shape: tuple[int, ...], dtype: type) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        size = max(math.prod(shape) * dtype.itemsize, 1)
+        block = SharedMemory(create=True, size=size)
+        self.blocks[name] = block
+        self.specs[name] = (block.name, shape, dtype.str)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # arrays still reference the block, the mapping goes away
+                # with them
+                pass
+        self.blocks.clear()
+
+
+# ========
+# WORKERS
+# ========
+_slots: Optional[types.SimpleNamespace] = None
+_blocks: list[SharedMemory] = []
+# grid of the last collision pass, its first _owned_count indices are the
+# shard's own entities and the rest ghosts, _owned_slots marks them by slot
+# once a query needs it
+_grid: Optional[physics.GridIndex] = None
+_owned_count: int = 0
+_owned_slots: Optional[np.ndarray] = None
+
+
+def _attach(specs: dict[str, tuple[str, tuple[int, ...], str]]):
+    global _slots
+    columns = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = SharedMemory(name=block_name, track=False)
+        _blocks.append(block)
+        columns[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    # quacks like an EntitySlotMap for the system kernels
+    _slots = types.SimpleNamespace(**columns)
+
+
+def _owned(shard: int, bounds: np.ndarray) -> np.ndarray:
+    return _slots.shard_order[bounds[shard] : bounds[shard + 1]]
+
+
+def _move(shard: int, bounds: np.ndarray, dt: float, width: float, height: float):
+    owned = _owned(shard, bounds)
+    main.update_movement(_slots, owned, dt, width, height)
+
+
+def _collide(
+    shard: int,
+    bounds: np.ndarray,
+    strip_width: float,
+    halo: float,
+    cell_size: tuple[float, float],
+) -> tuple[np.ndarray, ...]:
+    owned = _owned(shard, bounds)
+
+    # ghosts, neighbour entities close enough to the border to touch ours
+    parts = [owned]
+    if shard > 0:
+        left = _owned(shard - 1, bounds)
+        parts.append(left[_slots.px[left] >= shard * strip_width - halo])
+    if shard + 1 < len(bounds) - 1:
+        right = _owned(shard + 1, bounds)
+        parts.append(right[_slots.px[right] < (shard + 1) * strip_width + halo])
+    indices = np.concatenate(parts)
+
+    global _grid, _owned_count, _owned_slots
+    grid = _grid = physics.GridIndex(*cell_size)
+    _owned_count = len(owned)
+    _owned_slots = None
+    grid.build(
+        indices,
+        _slots.px[indices],
+        _slots.py[indices],
+        _slots.collider_radius[indices],
+    )
+    contacts = physics.narrow_phase(
+        *grid.pairs(),
+        _slots.collision_layer,
+        _slots.collision_mask,
+        _slots.px,
+        _slots.py,
+        _slots.collider_radius,
+    )
+
+    # pairs seen by two shards are kept by the owner of the lower slot
+    keep = _slots.shard[np.minimum(contacts.a, contacts.b)] == shard
+    return (
+        contacts.a[keep],
+        contacts.b[keep],
+        contacts.nx[keep],
+        contacts.ny[keep],
+        contacts.depth[keep],
+    )
+
+
+def _sweep(movers: np.ndarray) -> tuple[np.ndarray, ...]:
+    # the shard's own movers against its grid, the halo holds anything they
+    # can reach in a step
+    contacts = physics.sweep_circles(
+        _grid,
+        movers,
+        _slots.px,
+        _slots.py,
+        _slots.prev_px,
+        _slots.prev_py,
+        _slots.collider_radius,
+        _slots.collision_layer,
+        _slots.collision_mask,
+    )
+    return (
+        contacts.a,
+        contacts.b,
+        contacts.nx,
+        contacts.ny,
+        contacts.depth,
+        contacts.toi,
+    )
+
+
+def _query_radius(
+    qx: np.ndarray, qy: np.ndarray, radius: np.ndarray
+) -> tuple[np.ndarray, ...]:
+    query, index, dist2 = physics.query_radius(
+        _grid, qx, qy, radius, _slots.px, _slots.py
+    )
+    # ghosts are answered by their own shard
+    global _owned_slots
+    if _owned_slots is None:
+        _owned_slots = np.zeros(len(_slots.active), dtype=np.bool_)
+        _owned_slots[_grid.indices[:_owned_count]] = True
+    keep = _owned_slots[index]
+    return query[keep], index[keep], dist2[keep]
+
+
+def _query_box(x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+    entity = physics.query_box(_grid, x0, y0, x1, y1)
+    return _grid.indices[entity[entity < _owned_count]]
+
+
+# ============
+# MAIN PROCESS
+# ============
+class ShardedPhysics(main.PhysicsSystem):
+    # the workers hold the grids, the one of the base class stays empty
+    def __init__(self, simulation: "ShardedSimulation", base: main.PhysicsSystem):
+        super().__init__(
+            base.cell_size_x,
+            base.cell_size_y,
+            base.iterations,
+            base.restitution,
+            base.neighbours.skin,
+            base.neighbours.limit,
+        )
+        self.simulation = simulation
+
+    def update(
+        self,
+        slots: main.EntitySlotMap,
+        indices: np.ndarray,
+        movers: Optional[np.ndarray] = None,
+    ):
+        self.contacts = self.simulation.collide(indices)
+        self.resolve(slots)
+        self.sweep(slots, movers)
+        self.diff_contacts()
+
+    def sweep(self, slots: main.EntitySlotMap, movers: Optional[np.ndarray]):
+        if movers is None:
+            self.sweeps = physics.Contacts.empty()
+            return
+        self.sweeps = physics.first_hits(self.simulation.sweep(movers))
+
+    def _query_radius(
+        self,
+        slots: main.EntitySlotMap,
+        qx: np.ndarray,
+        qy: np.ndarray,
+        radius: float | np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.simulation.query_radius(qx, qy, np.broadcast_to(radius, qx.shape))
+
+    def _query_box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        return self.simulation.query_box(x0, y0, x1, y1)
+
+
+class ShardedSimulation:
+    def __init__(self, world: main.World, arrays: SharedArrays, shards: int):
+        assert 0 < shards < 128
+        self.world = world
+        self.shards = shards
+        self.arrays = arrays
+
+        count = world.slots.count
+        self.shard = arrays("shard", (count,), np.int8)
+        self.shard[:] = 0
+        # active slots grouped by shard, shard s owns order[bounds[s]:bounds[s+1]]
+        self.order = arrays("shard_order", (count,), np.int64)
+        self.bounds = np.zeros(shards + 1, dtype=np.int64)
+
+        world.physics_system = ShardedPhysics(self, world.physics_system)
+        # a pool of one per shard, so a shard always finds its grid in the
+        # same worker
+        self.pools = [
+            ProcessPoolExecutor(1, initializer=_attach, initargs=(arrays.specs,))
+            for _ in range(shards)
+        ]
+        # whether the workers hold grids of the current entities
+        self.gridded = False
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown()
+
+    def strip_width(self) -> float:
+        return self.world.width / self.shards
+
+    def migrate(self, indices: np.ndarray):
+        # reassign every entity to the strip it is in now
+        shard = self.world.slots.px[indices] // self.strip_width()
+        shard = np.clip(shard, 0, self.shards - 1).astype(np.int8)
+        self.shard[indices] = shard
+
+        order = np.argsort(shard, kind="stable")
+        self.order[: len(indices)] = indices[order]
+        self.bounds[1:] = np.cumsum(np.bincount(shard, minlength=self.shards))
+
+    def move(self, indices: np.ndarray, dt: float):
+        self.migrate(indices)
+        width = self.world.width
+        height = self.world.height
+        futures = [
+            pool.submit(_move, shard, self.bounds, dt, width, height)
+            for shard, pool in enumerate(self.pools)
+        ]
+        for future in futures:
+            future.result()
+
+    def collide(self, indices: np.ndarray) -> physics.Contacts:
+        self.migrate(indices)
+        slots = self.world.slots
+        self.gridded = len(indices) > 0
+        if not self.gridded:
+            return physics.Contacts.empty()
+
+        # wide enough for any pair of touching colliders, and for sweeps of
+        # anything that moved as far as the fastest during the step
+        moved = np.hypot(
+            slots.px[indices] - slots.prev_px[indices],
+            slots.py[indices] - slots.prev_py[indices],
+        )
+        halo = 2 * float(slots.collider_radius[indices].max() + moved.max())
+        physics_system = self.world.physics_system
+        cell_size = (physics_system.cell_size_x, physics_system.cell_size_y)
+        futures = [
+            pool.submit(
+                _collide, shard, self.bounds, self.strip_width(), halo, cell_size
+            )
+            for shard, pool in enumerate(self.pools)
+        ]
+        parts = [future.result() for future in futures]
+        return physics.Contacts(*(np.concatenate(column) for column in zip(*parts)))
+
+    def sweep(self, movers: np.ndarray) -> physics.Contacts:
+        # every mover is swept by the shard it was in at the collision pass
+        if not self.gridded or len(movers) == 0:
+            return physics.Contacts.empty()
+        shard = self.shard[movers]
+        futures = [
+            pool.submit(_sweep, movers[shard == index])
+            for index, pool in enumerate(self.pools)
+            if (shard == index).any()
+        ]
+        parts = [future.result() for future in futures]
+        return physics.Contacts(*(np.concatenate(column) for column in zip(*parts)))
+
+    def query_radius(
+        self, qx: np.ndarray, qy: np.ndarray, radius: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # physics.query_radius over the grids of the last collision pass
+        if not self.gridded or len(qx) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=self.world.slots.px.dtype)
+        futures = [pool.submit(_query_radius, qx, qy, radius) for pool in self.pools]
+        query, index, dist2 = (
+            np.concatenate(column)
+            for column in zip(*(future.result() for future in futures))
+        )
+        # the same order whatever the strips
+        order = np.lexsort((index, query))
+        return query[order], index[order], dist2[order]
+
+    def query_box(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        # slot indices of everything in a cell of the grids overlapping the box
+        if not self.gridded:
+            return np.empty(0, dtype=np.int64)
+        futures = [pool.submit(_query_box, x0, y0, x1, y1) for pool in self.pools]
+        return np.sort(np.concatenate([future.result() for future in futures]))
+
+
+def step(world: main.World, simulation: ShardedSimulation, dt: float):
+    # same as main.step but movement runs in the workers. Enemy steering
+    # stays here, flocking neighbours cross the strips and the neighbour
+    # lists would have to be rebuilt whenever an enemy enters a ghost band
+    with world.profiler.section("world"):
+        world.update(dt)
+    for system in main.SYSTEMS:
+        with world.profiler.section(system.name):
+            match system.name:
+                case "movement":
+                    simulation.move(world.entities.indices, world.dt)
+                case _:
+                    system.run(world)
@@ -0,0 +1,208 @@
+import json
+import os
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+import main
+import timers
+
+# NOTE: a snapshot is a small header followed by raw numpy columns, every
+# column starts on an ALIGNMENT byte boundary so loading only has to memory
+# map the file and view each column in place
+#
+#   magic (8 bytes) | version (u32) | metadata size (u32) | metadata (json)
+#   | padding | column | padding | column ...
+#
+# the metadata holds the world clock and size, free_count, group sizes, input
+# key states, the rng state and name, dtype, shape and offset of every column
+
+MAGIC = b"SOASNAP\0"
+VERSION = 4
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# NOTE: references (not copies) to everything a snapshot stores, the scalars
+# are read right away
+def _columns(world: main.World) -> tuple[dict, dict[str, np.ndarray]]:
+    columns = dict(world.slots.arrays())
+    groups = {}
+    for name in world.GROUPS:
+        group: main.DenseSet = getattr(world, name)
+        columns[f"{name}.dense"] = group.dense
+        columns[f"{name}.sparse"] = group.sparse
+        groups[name] = group.size
+    columns["remove_list"] = np.concatenate(
+        [np.empty(0, dtype=np.int64), *world.remove_list]
+    )
+    # contact events of the next step are relative to these
+    columns["contact_keys"] = world.physics_system.contact_keys
+    for name in ("lifetimes", "cooldowns"):
+        wheel: timers.TimerWheel = getattr(world, name)
+        columns[f"{name}.handles"], columns[f"{name}.due"] = wheel.entries()
+
+    metadata = {
+        "count": world.slots.count,
+        "time": world.time,
+        "width": world.width,
+        "height": world.height,
+        "free_count": world.slots.free_count,
+        "groups": groups,
+        "inputs": [key.state.value for key in world.inputs.keys()],
+        "seed": world.seed,
+        "rng": world.rng.bit_generator.state,
+    }
+    return metadata, columns
+
+
+def capture(world: main.World) -> tuple[dict, dict[str, np.ndarray]]:
+    # consistent copy of the world, safe to write while the world keeps going
+    metadata, columns = _columns(world)
+    return metadata, {name: column.copy() for name, column in columns.items()}
+
+
+def write(path: str, metadata: dict, columns: dict[str, np.ndarray]):
+    table = []
+    # the metadata size isn't known before the offsets are, so leave a
+    # generous upper bound for the header and lay the columns out after it
+    offset = _align(PREFIX.size + 256 * (len(columns) + 4))
+    for name, column in columns.items():
+        table.append(
+            {
+                "name": name,
+                "dtype": column.dtype.str,
+                "shape": column.shape,
+                "offset": offset,
+            }
+        )
+        offset = _align(offset + column.nbytes)
+    encoded = json.dumps({**metadata, "columns": table}).encode()
+    assert PREFIX.size + len(encoded) <= table[0]["offset"], "header too large"
+
+    # write next to the target and swap it in so readers never see half a file
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, VERSION, len(encoded)))
+        file.write(encoded)
+        for entry, column in zip(table, columns.values()):
+            file.seek(entry["offset"])
+            file.write(np.ascontiguousarray(column).data)
+        # pad up to the aligned end so the last column maps fully
+        file.truncate(offset)
+    os.replace(temporary, path)
+
+
+def save(world: main.World, path: str):
+    # writes straight from the world's arrays, the world must not step meanwhile
+    write(path, *_columns(world))
+
+
+def read_header(path: str) -> dict:
+    with open(path, "rb") as file:
+        magic, version, size = PREFIX.unpack(file.read(PREFIX.size))
+        assert magic == MAGIC, f"{path} is not a snapshot"
+        assert version == VERSION, f"snapshot version {version} != {VERSION}"
+        return json.loads(file.read(size))
+
+
+# NOTE: mode "c" maps copy on write, the world can be stepped without touching
+# the file and only pages that get written are copied. "r+" writes through to
+# the file, "r" makes the world read only.
+def load(
+    path: str,
+    target_fps: int = 60,
+    platform: Optional[main.Platform] = None,
+    mode: str = "c",
+) -> main.World:
+    metadata = read_header(path)
+    buffer = np.memmap(path, np.uint8, mode)
+
+    columns = {}
+    for entry in metadata["columns"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        start = entry["offset"]
+        end = start + dtype.itemsize * int(np.prod(shape))
+        columns[entry["name"]] = buffer[start:end].view(dtype).reshape(shape)
+
+    slots = main.EntitySlotMap.from_arrays(columns, metadata["free_count"])
+    groups = {}
+    for name, size in metadata["groups"].items():
+        groups[name] = main.DenseSet.from_arrays(
+            columns[f"{name}.dense"], columns[f"{name}.sparse"], size
+        )
+
+    world = main.World(
+        target_fps,
+        metadata["count"],
+        platform,
+        slots=slots,
+        groups=groups,
+        seed=metadata["seed"],
+        width=metadata["width"],
+        height=metadata["height"],
+    )
+    world.rng.bit_generator.state = metadata["rng"]
+    world.time = metadata["time"]
+    world.last_time = world.time
+    world.push_destroy_entity(np.array(columns["remove_list"]))
+    world.physics_system.contact_keys = np.array(columns["contact_keys"])
+    for name in ("lifetimes", "cooldowns"):
+        wheel: timers.TimerWheel = getattr(world, name)
+        wheel.reset(world.time)
+        wheel.schedule(
+            np.array(columns[f"{name}.handles"]), np.array(columns[f"{name}.due"])
+        )
+    for key, state in zip(world.inputs.keys(), metadata["inputs"]):
+        key.state = main.InputState(state)
+    return world
+
+
+# NOTE: with fork the snapshot is a child process that writes the world as it
+# was at the fork, the kernel copies the pages the game writes to meanwhile.
+# The calling thread only pays for the fork, not for copying every column.
+# Without fork, or with columns in shared memory that a child would see
+# change, the copy is taken on the calling thread between two steps. Either
+# way the file io runs in the background and the frame never waits on disk.
+class SnapshotWriter:
+    def __init__(self, fork: bool = True):
+        self.fork = fork and hasattr(os, "fork")
+        self.pool = ThreadPoolExecutor(1)
+        self.pending: Optional[Future] = None
+
+    def save(self, world: main.World, path: str) -> Future:
+        if not self.fork:
+            self.pending = self.pool.submit(write, path, *capture(world))
+            return self.pending
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                save(world, path)
+                code = 0
+            finally:
+                # no cleanup of the parent's state, just leave
+                os._exit(code)
+        self.pending = self.pool.submit(_reap, pid, path)
+        return self.pending
+
+    def wait(self):
+        if self.pending is not None:
+            self.pending.result()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def _reap(pid: int, path: str):
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"writing snapshot {path} failed")
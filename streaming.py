@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import struct
+import time
+from typing import Optional
+
+import numpy as np
+import pyray as rl
+
+import headless
+import main
+
+# python streaming.py server [--enemies 10000] [--port 7777]
+# python streaming.py client [--host 127.0.0.1] [--port 7777]
+
+# NOTE: the server runs the authoritative world and streams what clients
+# need to draw it over tcp. Every tick the replicated fields are diffed
+# against a shadow copy of what clients already have:
+#
+# - removed: slots that went inactive
+# - full: spawned, reused or otherwise changed slots with type, color,
+#   radius and position
+# - moved: a bitmask over the slots plus an int8 delta per axis for every
+#   set bit, positions are quantized to 1 / POSITION_SCALE pixels
+#
+# clients apply the same integer deltas so their positions never drift from
+# the shadow. Slots whose delta doesn't fit an int8 (wrapping around the
+# screen) are sent in full. New clients get the shadow as one big message of
+# full entries and the regular deltas after that.
+#
+# Messages are framed with a uint32 length. The first message is a HELLO
+# with the slot count, POSITION_SCALE and the world size.
+
+POSITION_SCALE = 8
+HELLO = struct.Struct("<Iiff")
+FRAME = struct.Struct("<I")
+# tick, world time, server send time (perf_counter), removed, full, mask bytes
+HEADER = struct.Struct("<IddIII")
+# columns of the full entries: index, type, color, radius, quantized px, py
+FULL_COLUMNS = (
+    (np.uint32, ()),
+    (np.uint8, ()),
+    (np.uint8, (4,)),
+    (np.float32, ()),
+    (np.int32, ()),
+    (np.int32, ()),
+)
+
+
+def quantize(values: np.ndarray) -> np.ndarray:
+    return np.rint(values * POSITION_SCALE).astype(np.int32)
+
+
+def _full_entries(*columns: np.ndarray) -> list[bytes]:
+    return [
+        np.ascontiguousarray(column, dtype=dtype).tobytes()
+        for column, (dtype, _) in zip(columns, FULL_COLUMNS)
+    ]
+
+
+# ========
+# SERVER
+# ========
+class DeltaEncoder:
+    def __init__(self, count: int, width: float, height: float):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.tick = 0
+        # what clients have after the last message
+        self.active = np.zeros(count, dtype=np.bool_)
+        self.generation = np.zeros(count, dtype=np.int64)
+        self.type = np.zeros(count, dtype=np.uint8)
+        self.color = np.zeros((count, 4), dtype=np.uint8)
+        self.radius = np.zeros(count, dtype=np.float32)
+        self.qx = np.zeros(count, dtype=np.int32)
+        self.qy = np.zeros(count, dtype=np.int32)
+
+    def hello(self) -> bytes:
+        return HELLO.pack(self.count, POSITION_SCALE, self.width, self.height)
+
+    def keyframe(self, world_time: float) -> bytes:
+        indices = np.flatnonzero(self.active)
+        full = _full_entries(
+            indices,
+            self.type[indices],
+            self.color[indices],
+            self.radius[indices],
+            self.qx[indices],
+            self.qy[indices],
+        )
+        header = HEADER.pack(
+            self.tick, world_time, time.perf_counter(), 0, len(indices), 0
+        )
+        return b"".join((header, *full))
+
+    def encode(self, world: main.World) -> bytes:
+        slots = world.slots
+        active = slots.active
+        was = self.active
+        qx = quantize(slots.px)
+        qy = quantize(slots.py)
+        dx = qx - self.qx
+        dy = qy - self.qy
+
+        both = active & was
+        changed = both & (
+            (slots.generation != self.generation)
+            | (slots.type != self.type)
+            | (slots.color != self.color).any(axis=1)
+            | (slots.collider_radius != self.radius)
+            | (np.abs(dx) > 127)
+            | (np.abs(dy) > 127)
+        )
+        removed = np.flatnonzero(was & ~active)
+        full = np.flatnonzero((active & ~was) | changed)
+        moved = both & ~changed & ((dx != 0) | (dy != 0))
+        moved_indices = np.flatnonzero(moved)
+
+        # trailing zero bytes of the mask are left out
+        mask = b""
+        if len(moved_indices) > 0:
+            mask = np.packbits(moved[: moved_indices[-1] + 1]).tobytes()
+
+        self.tick += 1
+        message = b"".join(
+            (
+                HEADER.pack(
+                    self.tick,
+                    world.time,
+                    time.perf_counter(),
+                    len(removed),
+                    len(full),
+                    len(mask),
+                ),
+                removed.astype(np.uint32).tobytes(),
+                *_full_entries(
+                    full,
+                    slots.type[full],
+                    slots.color[full],
+                    slots.collider_radius[full],
+                    qx[full],
+                    qy[full],
+                ),
+                mask,
+                dx[moved_indices].astype(np.int8).tobytes(),
+                dy[moved_indices].astype(np.int8).tobytes(),
+            )
+        )
+
+        # the shadow follows what was sent
+        self.active[:] = active
+        self.generation[:] = slots.generation
+        self.type[full] = slots.type[full]
+        self.color[full] = slots.color[full]
+        self.radius[full] = slots.collider_radius[full]
+        self.qx[full] = qx[full]
+        self.qy[full] = qy[full]
+        self.qx[moved_indices] = qx[moved_indices]
+        self.qy[moved_indices] = qy[moved_indices]
+        return message
+
+
+def _send(writer: asyncio.StreamWriter, message: bytes):
+    writer.write(FRAME.pack(len(message)))
+    writer.write(message)
+
+
+class StreamServer:
+    def __init__(self, world: main.World):
+        self.world = world
+        self.encoder = DeltaEncoder(world.slots.count, world.width, world.height)
+        self.clients: set[asyncio.StreamWriter] = set()
+        # for benchmarks
+        self.bytes_sent = 0
+        self.encode_time = 0.0
+
+    async def _connected(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        # no await before the client joins, so the keyframe matches the shadow
+        # the next delta is encoded against
+        _send(writer, self.encoder.hello())
+        _send(writer, self.encoder.keyframe(self.world.time))
+        self.clients.add(writer)
+        try:
+            # clients don't send anything, wait for them to hang up
+            await reader.read()
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self._connected, host, port)
+
+    async def broadcast(self):
+        start = time.perf_counter()
+        message = self.encoder.encode(self.world)
+        self.encode_time += time.perf_counter() - start
+
+        clients = list(self.clients)
+        for writer in clients:
+            _send(writer, message)
+        self.bytes_sent += (FRAME.size + len(message)) * len(clients)
+        # NOTE: a slow client holds everyone back here, fine on loopback
+        await asyncio.gather(
+            *(writer.drain() for writer in clients), return_exceptions=True
+        )
+
+    async def run(self, tick_rate: float, ticks: Optional[int] = None):
+        dt = 1 / tick_rate
+        next_tick = time.perf_counter()
+        tick = 0
+        while ticks is None or tick < ticks:
+            headless.step(self.world, dt)
+            await self.broadcast()
+            tick += 1
+
+            next_tick += dt
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+
+# ========
+# CLIENT
+# ========
+# NOTE: rebuilds just enough of a world for the draw_* functions, slots plus
+# one DenseSet per entity type
+class Replica:
+    def __init__(self, count: int, width: float, height: float):
+        # world size
+        self.width = width
+        self.height = height
+        self.slots = main.EntitySlotMap(count)
+        self.groups = {
+            entity_type: main.DenseSet(count)
+            for entity_type in (
+                main.EntityType.PLAYER,
+                main.EntityType.ENEMY,
+                main.EntityType.PROJECTILE,
+            )
+        }
+        self.qx = np.zeros(count, dtype=np.int32)
+        self.qy = np.zeros(count, dtype=np.int32)
+        self.tick = 0
+        self.time = 0.0
+
+    def _leave_groups(self, indices: np.ndarray):
+        kinds = self.slots.type[indices]
+        for entity_type, group in self.groups.items():
+            group.remove_many(indices[kinds == entity_type])
+
+    def apply(self, message: bytes) -> float:
+        # returns the server send time of the message
+        tick, world_time, stamp, removed_count, full_count, mask_size = (
+            HEADER.unpack_from(message)
+        )
+        offset = HEADER.size
+        self.tick = tick
+        self.time = world_time
+        slots = self.slots
+
+        # interpolation starts from where everything was drawn last tick
+        for group in self.groups.values():
+            slots.prev_px[group.indices] = slots.px[group.indices]
+            slots.prev_py[group.indices] = slots.py[group.indices]
+
+        removed = np.frombuffer(message, np.uint32, removed_count, offset)
+        offset += removed.nbytes
+        removed = removed.astype(np.int64)
+        self._leave_groups(removed)
+        slots.active[removed] = False
+
+        columns = []
+        for dtype, shape in FULL_COLUMNS:
+            shape = (full_count, *shape)
+            column = np.frombuffer(message, dtype, int(np.prod(shape)), offset)
+            offset += column.nbytes
+            columns.append(column.reshape(shape))
+        full, kind, color, radius, qx, qy = columns
+        full = full.astype(np.int64)
+
+        # reused slots leave the group of their old type first
+        self._leave_groups(full[slots.active[full]])
+        slots.active[full] = True
+        slots.type[full] = kind
+        slots.color[full] = color
+        slots.collider_radius[full] = radius
+        self.qx[full] = qx
+        self.qy[full] = qy
+        slots.px[full] = qx / POSITION_SCALE
+        slots.py[full] = qy / POSITION_SCALE
+        slots.prev_px[full] = slots.px[full]
+        slots.prev_py[full] = slots.py[full]
+        for entity_type, group in self.groups.items():
+            group.add_many(full[kind == entity_type])
+
+        mask = np.frombuffer(message, np.uint8, mask_size, offset)
+        offset += mask_size
+        moved = np.flatnonzero(np.unpackbits(mask))
+        dx = np.frombuffer(message, np.int8, len(moved), offset)
+        dy = np.frombuffer(message, np.int8, len(moved), offset + len(moved))
+        self.qx[moved] += dx
+        self.qy[moved] += dy
+        slots.px[moved] = self.qx[moved] / POSITION_SCALE
+        slots.py[moved] = self.qy[moved] / POSITION_SCALE
+        return stamp
+
+
+async def read_message(reader: asyncio.StreamReader) -> bytes:
+    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return await reader.readexactly(size)
+
+
+async def connect(
+    host: str, port: int
+) -> tuple[Replica, asyncio.StreamReader, asyncio.StreamWriter]:
+    reader, writer = await asyncio.open_connection(host, port)
+    count, scale, width, height = HELLO.unpack(await read_message(reader))
+    assert scale == POSITION_SCALE, "server quantizes positions differently"
+    return Replica(count, width, height), reader, writer
+
+
+async def view(host: str, port: int, tick_rate: float):
+    replica, reader, writer = await connect(host, port)
+    rl.init_window(main.INIT_WIDTH, main.INIT_HEIGHT, "SoAsteroids viewer")
+    rl.set_target_fps(60)
+
+    # messages arrive in the background, the frame only draws the replica
+    last_message = time.perf_counter()
+
+    async def receive():
+        nonlocal last_message
+        while True:
+            replica.apply(await read_message(reader))
+            last_message = time.perf_counter()
+
+    receiver = asyncio.create_task(receive())
+    camera = main.Camera()
+    try:
+        while not rl.window_should_close() and not receiver.done():
+            alpha = min((time.perf_counter() - last_message) * tick_rate, 1)
+            groups = replica.groups
+            players = groups[main.EntityType.PLAYER].indices
+            if len(players) > 0:
+                px, py = main.interpolate(replica.slots, int(players[0]), alpha)
+                camera.follow(
+                    px,
+                    py,
+                    replica.width,
+                    replica.height,
+                    rl.get_screen_width(),
+                    rl.get_screen_height(),
+                )
+
+            rl.begin_drawing()
+            rl.clear_background(rl.BLACK)
+            # the replica has no grid, everything is drawn
+            rl.begin_mode_2d(camera.to_raylib())
+            main.draw_player(
+                replica.slots, groups[main.EntityType.PLAYER].indices, alpha
+            )
+            main.draw_projectile(
+                replica.slots, groups[main.EntityType.PROJECTILE].indices, alpha
+            )
+            main.draw_enemy(replica.slots, groups[main.EntityType.ENEMY].indices, alpha)
+            rl.end_mode_2d()
+            rl.draw_fps(0, 0)
+            rl.end_drawing()
+            # let the receiver run
+            await asyncio.sleep(0)
+    finally:
+        receiver.cancel()
+        writer.close()
+        rl.close_window()
+
+
+async def serve(host: str, port: int, enemies: int, tick_rate: float):
+    world = headless.create_world(enemies, script=headless.zigzag_script())
+    server = StreamServer(world)
+    listener = await server.start(host, port)
+    print(f"serving {enemies} enemies on {host}:{port}")
+    async with listener:
+        await server.run(tick_rate)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="stream the world to viewers")
+    parser.add_argument("mode", choices=("server", "client"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--enemies", type=int, default=250)
+    parser.add_argument("--tick-rate", type=float, default=60)
+    args = parser.parse_args()
+
+    if args.mode == "server":
+        asyncio.run(serve(args.host, args.port, args.enemies, args.tick_rate))
+    else:
+        asyncio.run(view(args.host, args.port, args.tick_rate))
+
+
+if __name__ == "__main__":
+    cli()
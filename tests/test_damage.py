@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pyray as rl
+
+import headless
+import main
+import physics
+
+
+def create_world() -> tuple[main.World, int, int]:
+    # the player with its weapon put away and an enemy right on top of it
+    world = headless.create_world(0, seed=0)
+    player = int(world.bhv_player.indices[0])
+    world.weapon_ready.remove(player)
+    entity = world.create_enemy(
+        float(world.slots.px[player]), float(world.slots.py[player])
+    )
+    return world, player, int(main.entity_index(entity))
+
+
+def touching(world: main.World, a: int, b: int) -> bool:
+    keys = physics.pair_keys(np.array([a]), np.array([b]))
+    return bool(np.isin(keys, world.physics_system.contact_keys)[0])
+
+
+class DamageTest(unittest.TestCase):
+    def test_player_contact_does_no_damage(self):
+        world, player, enemy = create_world()
+        headless.step(world, 1 / 60)
+        self.assertTrue(touching(world, player, enemy))
+
+        headless.run(world, 10)
+        self.assertTrue(world.slots.active[enemy])
+        self.assertEqual(world.slots.health[enemy], world.slots.health_max[enemy])
+        self.assertEqual(world.slots.health[player], world.slots.health_max[player])
+
+    def test_projectile_contact_damages(self):
+        world, player, enemy = create_world()
+        world.create_projectile(
+            float(world.slots.px[enemy]),
+            float(world.slots.py[enemy]),
+            1,
+            0,
+            main.Layer.PLAYER_PROJECTILE,
+            main.Mask.PLAYER_PROJECTILE,
+            1,
+            rl.YELLOW,
+            int(world.slots.weapon_damage[player]),
+        )
+        headless.step(world, 1 / 60)
+        self.assertEqual(
+            world.slots.health[enemy],
+            world.slots.health_max[enemy] - world.slots.weapon_damage[player],
+        )
+        # the spent projectile is gone with the next update
+        headless.step(world, 1 / 60)
+        self.assertEqual(len(world.bhv_projectile), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
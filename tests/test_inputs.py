@@ -0,0 +1,49 @@
+import unittest
+
+import pyray as rl
+
+import main
+
+
+class FramePlatform(main.Platform):
+    # keys as the window reports them for the current render frame, a press
+    # only shows in the frame it happened in
+    def __init__(self):
+        self.pressed: set[rl.KeyboardKey] = set()
+        self.down: set[rl.KeyboardKey] = set()
+
+    def frame(self, pressed=(), down=()):
+        self.pressed = set(pressed)
+        self.down = set(down)
+
+    def is_key_pressed(self, key: rl.KeyboardKey) -> bool:
+        return key in self.pressed
+
+    def is_key_down(self, key: rl.KeyboardKey) -> bool:
+        return key in self.down
+
+
+class InputsTest(unittest.TestCase):
+    def test_press_in_frame_without_tick(self):
+        platform = FramePlatform()
+        inputs = main.Inputs()
+        key = rl.KeyboardKey.KEY_D
+
+        # pressed in a frame that ran no tick, nothing updates the inputs
+        platform.frame(pressed=[key], down=[key])
+        # held in the frames after
+        platform.frame(down=[key])
+        inputs.update(platform)
+        self.assertEqual(inputs.right_key.state, main.InputState.JUST_PRESSED)
+        inputs.update(platform)
+        self.assertEqual(inputs.right_key.state, main.InputState.PRESSED)
+        self.assertEqual(inputs.horizontal, 1)
+
+        platform.frame()
+        inputs.update(platform)
+        self.assertEqual(inputs.right_key.state, main.InputState.JUST_RELEASED)
+        self.assertEqual(inputs.horizontal, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
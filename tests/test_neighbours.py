@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+
+import physics
+
+WIDTH = 1000
+HEIGHT = 800
+RADIUS = 100
+
+
+def brute_force(indices, px, py, radius, limit):
+    # {(slot, neighbour slot): (dx, dy)} of every pair within radius, wrapped
+    dx = px[None, :] - px[:, None]
+    dy = py[None, :] - py[:, None]
+    dx = (dx + WIDTH / 2) % WIDTH - WIDTH / 2
+    dy = (dy + HEIGHT / 2) % HEIGHT - HEIGHT / 2
+    dist2 = dx * dx + dy * dy
+    inside = dist2 <= (radius * radius)[:, None]
+    np.fill_diagonal(inside, False)
+    if limit is not None:
+        # ties with the limit-th nearest count as well
+        ranked = np.sort(np.where(inside, dist2, np.inf), axis=1)
+        kth = ranked[:, limit - 1] if len(indices) >= limit else np.inf
+        inside &= dist2 <= np.broadcast_to(kth, (len(indices),))[:, None]
+    query, neighbour = np.nonzero(inside)
+    return {
+        (int(indices[q]), int(indices[n])): (dx[q, n], dy[q, n])
+        for q, n in zip(query, neighbour)
+    }
+
+
+class NeighbourListTest(unittest.TestCase):
+    def check(self, neighbours, indices, px, py, limit):
+        radius = np.full(len(indices), RADIUS, dtype=np.float32)
+        neighbour, dx, dy, counts = neighbours.query_radius(
+            indices, px[indices], py[indices], radius, WIDTH, HEIGHT
+        )
+        self.assertEqual(counts.sum(), len(neighbour))
+        query = np.repeat(indices, counts)
+        found = {
+            (int(q), int(indices[n])): (x, y)
+            for q, n, x, y in zip(query, neighbour, dx, dy)
+        }
+        expected = brute_force(indices, px[indices], py[indices], radius, limit)
+        self.assertEqual(found.keys(), expected.keys())
+        for pair, offset in expected.items():
+            np.testing.assert_allclose(found[pair], offset, atol=1e-3)
+
+    def run_churn(self, count: int, limit, seed: int):
+        # entities drift, some die every frame and come back in waves
+        rng = np.random.default_rng(seed)
+        px = rng.uniform(0, WIDTH, count).astype(np.float32)
+        py = rng.uniform(0, HEIGHT, count).astype(np.float32)
+        vx = rng.uniform(-3, 3, count).astype(np.float32)
+        vy = rng.uniform(-3, 3, count).astype(np.float32)
+        alive = np.ones(count, dtype=np.bool_)
+        neighbours = physics.NeighbourList(20, limit)
+        for frame in range(40):
+            px = (px + vx) % WIDTH
+            py = (py + vy) % HEIGHT
+            alive[rng.choice(np.flatnonzero(alive), 2, replace=False)] = False
+            if frame % 10 == 9:
+                alive[:] = True
+            indices = np.flatnonzero(alive)
+            # swap removes leave groups out of slot order
+            indices = np.concatenate((indices[::2], indices[1::2]))
+            self.check(neighbours, indices, px, py, limit)
+
+    def test_dense(self):
+        for limit in (None, 3):
+            self.run_churn(200, limit, 0)
+
+    def test_sparse(self):
+        # mostly isolated entities, empty lists anywhere including the end
+        for limit in (None, 3):
+            for seed in range(5):
+                self.run_churn(20, limit, seed)
+
+    def test_death_with_isolated_last(self):
+        px = np.array([100, 110, 120, 130, 600], dtype=np.float32)
+        py = np.array([100, 100, 100, 100, 500], dtype=np.float32)
+        for limit in (None, 3):
+            neighbours = physics.NeighbourList(20, limit)
+            self.check(neighbours, np.arange(5), px, py, limit)
+            self.check(neighbours, np.array([0, 4, 2, 3]), px, py, limit)
+            self.assertEqual(neighbours.rebuilds, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
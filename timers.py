@@ -0,0 +1,93 @@
+import numpy as np
+
+# NOTE: timer wheel of entity handles. The near future is split into `size`
+# buckets of `resolution` seconds, a bucket is a list of the batches of
+# (handle, due time) that fall into it. Timers further out than a revolution
+# wait in a far list that is cascaded into the wheel once per revolution, so
+# an advance only touches the buckets it passes and the timers in them.
+#
+#   bucket b (absolute) lives at buckets[b % size] while cursor <= b < cursor
+#   + size, a timer fires on the first advance at or after its due time
+
+
+class TimerWheel:
+    def __init__(self, resolution: float, now: float, size: int = 256):
+        assert resolution > 0 and size > 0
+        self.resolution = resolution
+        self.size = size
+        self.reset(now)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def reset(self, now: float):
+        # drops every timer, the next advance starts at now
+        self.buckets: list[list[tuple[np.ndarray, np.ndarray]]] = [
+            [] for _ in range(self.size)
+        ]
+        self.far: list[tuple[np.ndarray, np.ndarray]] = []
+        # absolute bucket of the last advance
+        self.cursor: int = self._bucket(now)
+        self.count: int = 0
+
+    def _bucket(self, due: float) -> int:
+        return int(np.floor(due / self.resolution))
+
+    def schedule(self, handles: np.ndarray, due: float | np.ndarray):
+        handles = np.asarray(handles, dtype=np.int64)
+        due = np.broadcast_to(np.asarray(due, dtype=np.float64), handles.shape)
+        if len(handles) == 0:
+            return
+        self.count += len(handles)
+
+        # overdue timers go in the current bucket and fire with the next advance
+        bucket = np.maximum(np.floor(due / self.resolution), self.cursor)
+        near = bucket < self.cursor + self.size
+        if not near.all():
+            self.far.append((handles[~near], due[~near]))
+            handles, due, bucket = handles[near], due[near], bucket[near]
+
+        # a batch usually shares one due time, so one append per distinct bucket
+        order = np.argsort(bucket, kind="stable")
+        bucket = bucket[order].astype(np.int64)
+        starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+        ends = np.append(starts[1:], len(bucket))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            chunk = order[start:end]
+            self.buckets[int(bucket[start]) % self.size].append(
+                (handles[chunk], due[chunk])
+            )
+
+    def advance(self, now: float) -> np.ndarray:
+        # handles of every timer due at now, sorted, stale ones included
+        current = max(self._bucket(now), self.cursor)
+        popped = []
+        last = min(current, self.cursor + self.size - 1)
+        for bucket in range(self.cursor, last + 1):
+            popped += self.buckets[bucket % self.size]
+            self.buckets[bucket % self.size] = []
+        # crossing into the next revolution brings far timers into reach
+        if current // self.size != self.cursor // self.size:
+            popped += self.far
+            self.far = []
+        self.cursor = current
+        if not popped:
+            return np.empty(0, dtype=np.int64)
+
+        handles = np.concatenate([batch for batch, _ in popped])
+        due = np.concatenate([batch for _, batch in popped])
+        fired = due <= now
+        self.count -= len(handles)
+        # the rest of the current bucket and far timers still out of reach
+        self.schedule(handles[~fired], due[~fired])
+        return np.sort(handles[fired])
+
+    def entries(self) -> tuple[np.ndarray, np.ndarray]:
+        # (handles, due times) of every pending timer, e.g. for snapshots
+        batches = [batch for bucket in self.buckets for batch in bucket] + self.far
+        if not batches:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return (
+            np.concatenate([handles for handles, _ in batches]),
+            np.concatenate([due for _, due in batches]),
+        )
@@ -1,5 +1,6 @@
 import sys
 import math
+import numpy as np
 import pyray as rl
 
 ZERO = rl.Vector2(0, 0)
@@ -43,3 +44,12 @@ def distanceTo(v1: rl.Vector2, v2: rl.Vector2) -> float:
 
 def distanceToSquared(v1: rl.Vector2, v2: rl.Vector2) -> float:
     return length2(rl.Vector2(v1.x - v2.x, v1.y - v2.y))
+
+
+def normalize_arrays(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # batched normalize, zero length vectors stay zero
+    length = np.hypot(x, y)
+    safe = length > sys.float_info.epsilon
+    x = np.divide(x, length, out=np.zeros_like(x), where=safe)
+    y = np.divide(y, length, out=np.zeros_like(y), where=safe)
+    return x, y